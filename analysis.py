@@ -0,0 +1,509 @@
+"""
+Vectorized audio analysis and QA index for generated outputs
+
+Usage:
+    python analysis.py outputs
+    python analysis.py outputs --flagged
+"""
+import argparse
+import os
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+import config
+from captions import load_spoken_text
+from history import HistoryIndex, get_default_index
+from utils import estimate_audio_duration, split_pause_markers
+
+
+# Analysis settings
+FRAME_SECONDS = 0.02          # Frame length for silence detection
+BLOCK_FRAMES = 4096           # Frames processed per vectorized block
+SILENCE_DBFS = -50.0          # Frames quieter than this count as silence
+CLIP_LEVEL = 32767            # Samples at or beyond full scale count as clipped
+
+# QA flag thresholds
+MAX_CLIP_RATIO = 0.001
+MAX_SILENCE_RATIO = 0.8
+MIN_RATE_RATIO = 0.5          # Actual / expected duration below this looks truncated
+MAX_RATE_RATIO = 2.0          # ... above this looks stalled or padded
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".opus", ".ogg", ".mp3")
+
+
+def expected_duration(text: str) -> float:
+    """
+    Expected duration of text, including any inline pause markers
+
+    Args:
+        text: Spoken text (the transcript, not the full advanced prompt)
+
+    Returns:
+        Expected duration in seconds
+    """
+    total = 0.0
+    for segment in split_pause_markers(text):
+        if isinstance(segment, str):
+            total += estimate_audio_duration(segment)
+        else:
+            total += segment
+    return total
+
+
+def load_samples(path: Path) -> tuple[np.ndarray, int]:
+    """
+    Load audio samples as an int16 array of shape (frames, channels)
+
+    16-bit PCM WAV files are memory-mapped, so nothing is read until a block
+    is analyzed; other formats are decoded with soundfile.
+
+    Args:
+        path: Audio file path
+
+    Returns:
+        Tuple of (samples, sample_rate)
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".wav":
+        region = _wav_data_region(path)
+        if region is not None:
+            offset, frames, channels, rate = region
+            if frames == 0:
+                return np.zeros((0, channels), dtype="<i2"), rate
+            samples = np.memmap(path, dtype="<i2", mode="r", offset=offset,
+                                shape=(frames, channels))
+            return samples, rate
+
+    samples, rate = sf.read(str(path), dtype="int16", always_2d=True)
+    return samples, rate
+
+
+def _wav_data_region(path: Path) -> Optional[tuple[int, int, int, int]]:
+    """
+    Locate the PCM data chunk of a 16-bit WAV file
+
+    Returns:
+        Tuple of (byte offset, frames, channels, sample_rate), or None if
+        the file is not plain 16-bit PCM
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+
+        channels = rate = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if audio_format != 1 or bits != 16:
+                    return None
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if channels is None:
+                    return None
+                offset = f.tell()
+                available = path.stat().st_size - offset
+                data_size = min(chunk_size, available)
+                return offset, data_size // (2 * channels), channels, rate
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def analyze_samples(samples: np.ndarray, rate: int, expected_seconds: Optional[float] = None) -> dict:
+    """
+    Compute level, clipping, silence and speaking-rate metrics
+
+    Works block by block over (possibly memory-mapped) int16 samples so
+    memory use does not grow with file length.
+
+    Args:
+        samples: int16 array of shape (frames, channels)
+        rate: Sample rate
+        expected_seconds: Expected duration for the speaking-rate check (optional)
+
+    Returns:
+        Metrics and QA flags
+    """
+    total_frames, channels = samples.shape
+    frame_len = max(1, int(rate * FRAME_SECONDS))
+    block_len = frame_len * BLOCK_FRAMES
+    silence_level = (10 ** (SILENCE_DBFS / 20) * 32768) ** 2
+
+    sum_squares = 0.0
+    peak = 0
+    clipped = 0
+    silent_frames = 0
+    analysis_frames = 0
+
+    for start in range(0, total_frames, block_len):
+        block = np.asarray(samples[start:start + block_len], dtype=np.int32)
+        peak = max(peak, int(np.abs(block).max()))
+        clipped += int(np.count_nonzero((block >= CLIP_LEVEL) | (block <= -CLIP_LEVEL)))
+
+        mono = block.mean(axis=1) if channels > 1 else block[:, 0].astype(np.float64)
+        squares = np.square(mono, dtype=np.float64)
+        sum_squares += float(squares.sum())
+
+        usable = len(squares) - len(squares) % frame_len
+        if usable:
+            frame_power = squares[:usable].reshape(-1, frame_len).mean(axis=1)
+            silent_frames += int(np.count_nonzero(frame_power < silence_level))
+            analysis_frames += len(frame_power)
+
+    duration = total_frames / rate if rate else 0.0
+    rms = (sum_squares / total_frames) ** 0.5 / 32768 if total_frames else 0.0
+
+    result = {
+        "duration": duration,
+        "rms_dbfs": _to_dbfs(rms),
+        "peak_dbfs": _to_dbfs(peak / 32768),
+        "clip_ratio": clipped / (total_frames * channels) if total_frames else 0.0,
+        "silence_ratio": silent_frames / analysis_frames if analysis_frames else 1.0,
+        "expected_duration": expected_seconds,
+        "rate_ratio": duration / expected_seconds if expected_seconds else None,
+    }
+    result["flags"] = _qa_flags(result)
+    return result
+
+
+def analyze_file(path: Path, text: Optional[str] = None) -> dict:
+    """
+    Analyze a single audio file
+
+    Args:
+        path: Audio file path
+        text: Spoken text, used to check the speaking rate (optional)
+
+    Returns:
+        Metrics, QA flags and file identity (path, mtime, size)
+    """
+    path = Path(path)
+    stat = path.stat()
+    samples, rate = load_samples(path)
+    expected = expected_duration(text) if text else None
+
+    result = analyze_samples(samples, rate, expected)
+    result.update({
+        "path": str(path.resolve()),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+    })
+    return result
+
+
+def _to_dbfs(level: float) -> float:
+    """Convert a linear level (1.0 = full scale) to dBFS"""
+    return float(20 * np.log10(level)) if level > 0 else -120.0
+
+
+def _qa_flags(result: dict) -> list[str]:
+    """Flag results that look truncated, silent, clipped or mistimed"""
+    flags = []
+    if result["duration"] == 0:
+        return ["empty"]
+    if result["silence_ratio"] >= MAX_SILENCE_RATIO:
+        flags.append("silent")
+    if result["clip_ratio"] > MAX_CLIP_RATIO:
+        flags.append("clipped")
+    if result["rate_ratio"] is not None:
+        if result["rate_ratio"] < MIN_RATE_RATIO:
+            flags.append("truncated")
+        elif result["rate_ratio"] > MAX_RATE_RATIO:
+            flags.append("too_long")
+    return flags
+
+
+class QAIndex:
+    """SQLite index of audio analysis results"""
+
+    COLUMNS = (
+        "path", "mtime", "size", "duration", "rms_dbfs", "peak_dbfs", "clip_ratio",
+        "silence_ratio", "expected_duration", "rate_ratio", "flags", "analyzed_at",
+    )
+
+    def __init__(self, index_file: Optional[Path] = None):
+        """
+        Open (or create) the QA index
+
+        Args:
+            index_file: SQLite file path (default: config.QA_INDEX_FILE)
+        """
+        self.index_file = Path(index_file or config.QA_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS analysis (
+                path TEXT PRIMARY KEY,
+                mtime REAL,
+                size INTEGER,
+                duration REAL,
+                rms_dbfs REAL,
+                peak_dbfs REAL,
+                clip_ratio REAL,
+                silence_ratio REAL,
+                expected_duration REAL,
+                rate_ratio REAL,
+                flags TEXT,
+                analyzed_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS analysis_flags ON analysis (flags);
+        """)
+
+    def add(self, result: dict):
+        """Insert or replace the result for a file"""
+        row = dict(result)
+        row["flags"] = ",".join(result["flags"])
+        row["analyzed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO analysis ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [row[column] for column in self.COLUMNS]
+            )
+
+    def is_current(self, path: Path, with_rate: bool = False) -> bool:
+        """
+        Check whether a file is indexed and unchanged since analysis
+
+        Args:
+            path: Audio file path
+            with_rate: Also require the speaking-rate check to have been done
+        """
+        path = Path(path)
+        stat = path.stat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime, size, rate_ratio FROM analysis WHERE path = ?", (str(path.resolve()),)
+            ).fetchone()
+        return (
+            row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size
+            and (row[2] is not None or not with_rate)
+        )
+
+    def query(self, flagged_only: bool = False, flag: Optional[str] = None,
+              limit: int = 100, offset: int = 0) -> list[dict]:
+        """
+        Query indexed results, newest analysis first
+
+        Args:
+            flagged_only: Only return results with at least one flag
+            flag: Only return results with this flag (e.g. "clipped")
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            List of result dicts
+        """
+        where = []
+        params = []
+        if flagged_only:
+            where.append("flags != ''")
+        if flag:
+            where.append("(',' || flags || ',') LIKE ?")
+            params.append(f"%,{flag},%")
+
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM analysis"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY analyzed_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_result(row) for row in rows]
+
+    def outliers(self, column: str = "rate_ratio", z_score: float = 3.0) -> list[dict]:
+        """
+        Find results far from the index-wide mean of a metric
+
+        Args:
+            column: Metric column (e.g. "rate_ratio", "rms_dbfs")
+            z_score: Number of standard deviations that counts as an outlier
+
+        Returns:
+            List of result dicts
+        """
+        if column not in self.COLUMNS[3:10]:
+            raise ValueError(f"Not a numeric metric: {column}")
+
+        with self._lock:
+            mean, mean_sq, count = self._conn.execute(
+                f"SELECT AVG({column}), AVG({column} * {column}), COUNT({column}) FROM analysis"
+            ).fetchone()
+            if not count or count < 2:
+                return []
+            std = max(mean_sq - mean * mean, 0.0) ** 0.5
+            if std == 0:
+                return []
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM analysis "
+                f"WHERE ABS({column} - ?) > ? ORDER BY ABS({column} - ?) DESC",
+                (mean, z_score * std, mean)
+            ).fetchall()
+        return [self._to_result(row) for row in rows]
+
+    def _to_result(self, row: tuple) -> dict:
+        """Convert a database row to a result dict"""
+        result = dict(zip(self.COLUMNS, row))
+        result["flags"] = result["flags"].split(",") if result["flags"] else []
+        return result
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+
+_default_qa_index = None
+_default_qa_index_lock = threading.Lock()
+
+
+def get_default_qa_index() -> QAIndex:
+    """Shared QA index for the process (config.QA_INDEX_FILE)"""
+    global _default_qa_index
+    with _default_qa_index_lock:
+        if _default_qa_index is None:
+            _default_qa_index = QAIndex()
+        return _default_qa_index
+
+
+def check_output(path: Path, text: Optional[str] = None, index: Optional[QAIndex] = None) -> list[str]:
+    """
+    Analyze a file right after it was rendered and record it in the QA index
+
+    Every render path (app, watcher, queue workers, style batches) calls
+    this, so problems are flagged without a separate analysis.py pass.
+    Analysis errors are printed rather than raised: the render itself
+    succeeded.
+
+    Args:
+        path: Rendered audio file
+        text: Spoken text, used to check the speaking rate (optional)
+        index: QA index to update (default: get_default_qa_index())
+
+    Returns:
+        QA flags of the file (empty if it looks fine or could not be analyzed)
+    """
+    try:
+        result = analyze_file(path, text)
+        (index or get_default_qa_index()).add(result)
+        return result["flags"]
+    except Exception as e:
+        print(f"Error analyzing {Path(path).name}: {e}")
+        return []
+
+
+def find_spoken_text(path: Path, history: Optional[HistoryIndex] = None) -> Optional[str]:
+    """
+    Spoken text of a rendered file, for the speaking-rate check
+
+    Looks in the generation history first, then in the file's timing map
+    (name.timing.json, written with captions by every renderer).
+    """
+    text = history.spoken_text_for(path) if history is not None else None
+    return text or load_spoken_text(path)
+
+
+def analyze_directory(
+    directory: Path,
+    index: QAIndex,
+    max_workers: Optional[int] = None,
+    progress_callback=None,
+    history: Optional[HistoryIndex] = None
+) -> list[dict]:
+    """
+    Analyze every new or changed audio file in a directory across all cores
+
+    Args:
+        directory: Directory containing audio files
+        index: QA index to update (unchanged files are skipped)
+        max_workers: Number of worker processes (default: one per CPU core)
+        progress_callback: Callback function for progress updates
+        history: Generation history used to find each file's text
+
+    Returns:
+        Results for the files analyzed in this pass
+    """
+    paths = []
+    texts = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        text = find_spoken_text(path, history)
+        # Files analyzed before their text was known get the rate check now
+        if not index.is_current(path, with_rate=text is not None):
+            paths.append(path)
+            texts.append(text)
+    if not paths:
+        return []
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for path, result in zip(paths, executor.map(_analyze_quietly, paths, texts, chunksize=8)):
+            if isinstance(result, Exception):
+                if progress_callback:
+                    progress_callback(f"Error: {path.name}: {str(result)}")
+                continue
+            index.add(result)
+            results.append(result)
+            if progress_callback and result["flags"]:
+                progress_callback(f"{path.name}: {', '.join(result['flags'])}")
+
+    return results
+
+
+def _analyze_quietly(path: Path, text: Optional[str] = None):
+    """Analyze a file in a worker process, returning errors instead of raising"""
+    try:
+        return analyze_file(path, text)
+    except Exception as e:
+        return e
+
+
+def main():
+    """Bulk analysis command for an output directory"""
+    parser = argparse.ArgumentParser(description="Analyze generated audio and flag outliers")
+    parser.add_argument("directory", nargs="?", default=str(config.DEFAULT_OUTPUT_DIR),
+                        help="Directory containing audio files (default: outputs/)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--flagged", action="store_true",
+                        help="List all flagged files in the index after the pass")
+    args = parser.parse_args()
+
+    index = QAIndex()
+    start = time.perf_counter()
+    results = analyze_directory(Path(args.directory), index, args.workers, progress_callback=print,
+                                history=get_default_index())
+    elapsed = time.perf_counter() - start
+
+    audio_seconds = sum(r["duration"] for r in results)
+    flagged = sum(1 for r in results if r["flags"])
+    print(f"\nAnalyzed {len(results)} files ({audio_seconds / 3600:.2f} h of audio) "
+          f"in {elapsed:.1f}s, {flagged} flagged")
+
+    if args.flagged:
+        for result in index.query(flagged_only=True, limit=1000):
+            print(f"{result['path']}: {', '.join(result['flags'])}")
+
+    for result in index.outliers("rate_ratio"):
+        print(f"Speaking-rate outlier: {result['path']} ({result['rate_ratio']:.2f}x expected)")
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,12 @@ from datetime import datetime
 
 import config
 from audio_engine import AudioEngine
+from analysis import check_output
+from delivery import check_profile_format
+from history import get_default_index
+from history_panel import HistoryPanel
+from jobs import JOB_DEFAULTS, normalize_job, render_job
+from styles import StyleStore
 from utils import sanitize_filename, validate_text, create_prompt_from_components, save_history
 
 # Set appearance
@@ -32,16 +38,25 @@ class AudioGeneratorApp(ctk.CTk):
         # Application state
         self.api_key = config.API_KEY
         self.output_dir = config.DEFAULT_OUTPUT_DIR
+        self.output_format = list(config.OUTPUT_FORMATS.keys())[0]
+        self.delivery_profile = "native"
+        self.captions_enabled = True
         self.engine = None
+        self.history_panel = None
+        self.style_store = StyleStore()
+        self.loaded_style = None
         self.generation_count = 0
         
         # Load settings
         self.load_settings()
         
-        # Initialize engine if API key exists
-        if self.api_key:
+        # Initialize engine if API key exists (replay mode needs none)
+        if self.api_key or config.CASSETTE_MODE == "replay":
             try:
-                self.engine = AudioEngine(self.api_key)
+                self.engine = AudioEngine(self.api_key, delivery_profile=self.delivery_profile,
+                                          caption_formats=self.caption_formats())
+                # Connect while the window is being built, not on the first Generate
+                self.engine.prewarm()
             except Exception as e:
                 print(f"Warning: Could not initialize engine: {e}")
         
@@ -192,6 +207,28 @@ class AudioGeneratorApp(ctk.CTk):
         # Advanced mode inputs (hidden by default)
         self.advanced_frame = ctk.CTkFrame(content_frame)
         
+        # Style presets
+        style_frame = ctk.CTkFrame(self.advanced_frame, fg_color="transparent")
+        style_frame.pack(fill="x", pady=(5, 0))
+        
+        ctk.CTkLabel(style_frame, text="Style Preset:").pack(side="left", padx=(0, 5))
+        self.style_var = ctk.StringVar(value="")
+        self.style_menu = ctk.CTkOptionMenu(
+            style_frame,
+            variable=self.style_var,
+            values=self.style_store.names() or [""],
+            command=self.load_style,
+            width=180
+        )
+        self.style_menu.pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            style_frame,
+            text="💾 Save Style",
+            command=self.save_style,
+            width=110
+        ).pack(side="left", padx=5)
+        
         # Audio Profile
         ctk.CTkLabel(
             self.advanced_frame,
@@ -256,6 +293,40 @@ class AudioGeneratorApp(ctk.CTk):
         )
         browse_btn.pack(side="left", padx=5)
         
+        # Output format
+        format_frame = ctk.CTkFrame(output_frame)
+        format_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(format_frame, text="Format:").pack(side="left", padx=5)
+        self.format_var = ctk.StringVar(value=self.output_format)
+        format_menu = ctk.CTkOptionMenu(
+            format_frame,
+            variable=self.format_var,
+            values=list(config.OUTPUT_FORMATS.keys()),
+            width=200,
+            command=self.change_output_format
+        )
+        format_menu.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(format_frame, text="Delivery:").pack(side="left", padx=(20, 5))
+        self.delivery_var = ctk.StringVar(value=self.delivery_profile)
+        delivery_menu = ctk.CTkOptionMenu(
+            format_frame,
+            variable=self.delivery_var,
+            values=list(config.DELIVERY_PROFILES.keys()),
+            width=140,
+            command=self.change_delivery_profile
+        )
+        delivery_menu.pack(side="left", padx=5)
+        
+        self.captions_var = ctk.BooleanVar(value=self.captions_enabled)
+        ctk.CTkCheckBox(
+            format_frame,
+            text="Captions (SRT/VTT)",
+            variable=self.captions_var,
+            command=self.toggle_captions
+        ).pack(side="left", padx=(20, 5))
+        
         # Generate button
         self.generate_btn = ctk.CTkButton(
             output_frame,
@@ -278,6 +349,16 @@ class AudioGeneratorApp(ctk.CTk):
         )
         settings_btn.pack(fill="x")
         
+        # History button
+        history_btn = ctk.CTkButton(
+            output_frame,
+            text="📜 History",
+            command=self.show_history,
+            fg_color="#495057",
+            hover_color="#5A6268"
+        )
+        history_btn.pack(fill="x", pady=(5, 0))
+        
         # Status bar
         status_frame = ctk.CTkFrame(main_frame)
         status_frame.pack(fill="x", padx=10, pady=(5, 10))
@@ -320,6 +401,71 @@ class AudioGeneratorApp(ctk.CTk):
             self.output_label.configure(text=str(self.output_dir))
             self.save_settings()
     
+    def change_output_format(self, choice: str):
+        """Remember the selected output format"""
+        self.output_format = choice
+        self.save_settings()
+    
+    def change_delivery_profile(self, choice: str):
+        """Remember the selected delivery profile and apply it to the engine"""
+        self.delivery_profile = choice
+        if self.engine:
+            self.engine.delivery_profile = choice
+        self.save_settings()
+    
+    def caption_formats(self) -> tuple[str, ...]:
+        """Caption files the engine writes next to each render"""
+        return (config.CAPTIONS or ("srt", "vtt", "json")) if self.captions_enabled else ()
+    
+    def toggle_captions(self):
+        """Remember whether captions are written and apply it to the engine"""
+        self.captions_enabled = self.captions_var.get()
+        if self.engine:
+            self.engine.caption_formats = self.caption_formats()
+        self.save_settings()
+    
+    def load_style(self, name: str):
+        """Fill the audio profile, scene and director's notes from a preset"""
+        if not name:
+            return
+        preset = self.style_store.get(name)
+        for textbox, field in (
+            (self.audio_profile, "audio_profile"),
+            (self.scene, "scene"),
+            (self.directors_notes, "directors_notes"),
+        ):
+            textbox.delete("1.0", "end")
+            textbox.insert("1.0", preset[field])
+        self.loaded_style = preset
+    
+    def save_style(self):
+        """Save the current style fields as a preset (a new version if it exists)"""
+        dialog = ctk.CTkInputDialog(
+            text="Style preset name:",
+            title="Save Style"
+        )
+        name = (dialog.get_input() or "").strip()
+        if not name:
+            return
+        
+        try:
+            preset = self.style_store.save(
+                name,
+                self.audio_profile.get("1.0", "end-1c").strip(),
+                self.scene.get("1.0", "end-1c").strip(),
+                self.directors_notes.get("1.0", "end-1c").strip()
+            )
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save style: {str(e)}")
+            return
+        
+        self.loaded_style = preset
+        self.style_menu.configure(values=self.style_store.names())
+        self.style_var.set(preset["name"])
+        self.status_label.configure(
+            text=f"Status: Saved style {preset['name']} (version {preset['version']})"
+        )
+    
     def show_settings(self):
         """Show API settings dialog"""
         dialog = ctk.CTkToplevel(self)
@@ -357,15 +503,19 @@ class AudioGeneratorApp(ctk.CTk):
         def save_api_key():
             new_key = api_entry.get().strip()
             if new_key:
+                previous_key = self.api_key
                 self.api_key = new_key
                 # Update .env file
                 env_file = Path(__file__).parent / ".env"
                 with open(env_file, "w") as f:
                     f.write(f"GEMINI_API_KEY={new_key}\n")
                 
-                # Reinitialize engine
+                # Reinitialize the engine only for a new key (clients are cached per key)
                 try:
-                    self.engine = AudioEngine(self.api_key)
+                    if self.engine is None or new_key != previous_key:
+                        self.engine = AudioEngine(self.api_key, delivery_profile=self.delivery_profile,
+                                                  caption_formats=self.caption_formats())
+                        self.engine.prewarm()
                     messagebox.showinfo("Success", "API key saved successfully!")
                     dialog.destroy()
                 except Exception as e:
@@ -384,7 +534,7 @@ class AudioGeneratorApp(ctk.CTk):
     def generate_audio(self):
         """Generate audio from text"""
         # Validate API key
-        if not self.api_key or not self.engine:
+        if not self.engine:
             messagebox.showerror(
                 "API Key Required",
                 "Please set your Google Gemini API key in Settings"
@@ -395,6 +545,7 @@ class AudioGeneratorApp(ctk.CTk):
         # Get text based on mode
         if self.mode_var.get() == "basic":
             text = self.text_input.get("1.0", "end-1c").strip()
+            job = {"text": text}
         else:
             # Advanced mode - build prompt
             audio_profile = self.audio_profile.get("1.0", "end-1c").strip()
@@ -405,6 +556,20 @@ class AudioGeneratorApp(ctk.CTk):
             text = create_prompt_from_components(
                 audio_profile, scene, directors_notes, transcript
             )
+            job = {
+                "text": text,
+                "audio_profile": audio_profile,
+                "scene": scene,
+                "directors_notes": directors_notes,
+                "transcript": transcript,
+            }
+            
+            # Record the preset if the style fields are still as loaded
+            preset = self.loaded_style
+            if preset and (audio_profile, scene, directors_notes) == (
+                preset["audio_profile"], preset["scene"], preset["directors_notes"]
+            ):
+                job["style"] = f"{preset['name']}@{preset['version']}"
         
         # Validate text
         is_valid, error_msg = validate_text(text)
@@ -412,12 +577,43 @@ class AudioGeneratorApp(ctk.CTk):
             messagebox.showerror("Validation Error", error_msg)
             return
         
-        # Get filename from text
-        filename_base = sanitize_filename(text[:100])
-        output_path = self.output_dir / f"{filename_base}.wav"
+        # Speakers
+        speakers = None
+        if self.speaker_mode.get() == "multi":
+            speaker1 = self.speaker1_name.get() or "Speaker1"
+            speaker2 = self.speaker2_name.get() or "Speaker2"
+            
+            speakers = [
+                {"name": speaker1, "voice": self.speaker1_voice.get()},
+                {"name": speaker2, "voice": self.speaker2_voice.get()}
+            ]
+        
+        job.update({
+            "voice": self.voice_var.get(),
+            "model": config.MODELS[self.model_var.get()],
+            "format": config.OUTPUT_FORMATS[self.format_var.get()],
+            "speakers": speakers,
+        })
+        
+        self.start_generation(job)
+    
+    def start_generation(self, job: dict):
+        """
+        Render a job in a background thread (see jobs.py)
+        
+        Pause markers, advanced prompts and multi-speaker settings in the
+        job are all handled by render_job.
+        """
+        # Some profiles can't be saved in some formats (e.g. mu-law as FLAC)
+        try:
+            check_profile_format(self.delivery_profile, job["format"])
+        except ValueError as e:
+            messagebox.showerror("Unsupported Format", str(e))
+            return
         
-        # Get model
-        model_name = config.MODELS[self.model_var.get()]
+        # Get filename from text
+        filename_base = sanitize_filename(job["text"][:100])
+        output_path = self.output_dir / f"{filename_base}.{job['format']}"
         
         # Disable button during generation
         self.generate_btn.configure(state="disabled", text="⏳ Generating...")
@@ -425,35 +621,14 @@ class AudioGeneratorApp(ctk.CTk):
         # Run generation in thread
         def generate():
             try:
-                if self.speaker_mode.get() == "single":
-                    # Single speaker
-                    self.engine.generate_single_speaker(
-                        text=text,
-                        voice=self.voice_var.get(),
-                        model=model_name,
-                        output_path=output_path,
-                        progress_callback=self.update_progress
-                    )
-                else:
-                    # Multi-speaker
-                    speaker1 = self.speaker1_name.get() or "Speaker1"
-                    speaker2 = self.speaker2_name.get() or "Speaker2"
-                    
-                    speakers = [
-                        {"name": speaker1, "voice": self.speaker1_voice.get()},
-                        {"name": speaker2, "voice": self.speaker2_voice.get()}
-                    ]
-                    
-                    self.engine.generate_multi_speaker(
-                        text=text,
-                        speakers=speakers,
-                        model=model_name,
-                        output_path=output_path,
-                        progress_callback=self.update_progress
-                    )
+                render_job(self.engine, job, output_path, progress_callback=self.update_progress)
                 
                 # Save to history
-                save_history(text, self.voice_var.get(), output_path)
+                save_history(job["text"], job["voice"], output_path, model=job["model"], job=job)
+                
+                # Check the output for truncation, silence and clipping
+                qa_flags = check_output(output_path, job.get("transcript") or job["text"])
+                qa_note = f"\n\nQA warnings: {', '.join(qa_flags)}" if qa_flags else ""
                 
                 # Update generation count
                 self.generation_count += 1
@@ -462,7 +637,7 @@ class AudioGeneratorApp(ctk.CTk):
                 # Success
                 self.after(100, lambda: messagebox.showinfo(
                     "Success",
-                    f"Audio generated successfully!\n\nSaved as: {output_path.name}"
+                    f"Audio generated successfully!\n\nSaved as: {output_path.name}{qa_note}"
                 ))
                 
             except Exception as e:
@@ -482,6 +657,44 @@ class AudioGeneratorApp(ctk.CTk):
         thread = threading.Thread(target=generate, daemon=True)
         thread.start()
     
+    def show_history(self):
+        """Show the generation history browser"""
+        if self.history_panel is not None and self.history_panel.winfo_exists():
+            self.history_panel.refresh()
+            self.history_panel.focus()
+            return
+        
+        self.history_panel = HistoryPanel(self, get_default_index(), self.regenerate_entry)
+    
+    def regenerate_entry(self, entry: dict):
+        """Generate a history entry again with its original settings"""
+        if not self.engine:
+            messagebox.showerror(
+                "API Key Required",
+                "Please set your Google Gemini API key in Settings"
+            )
+            return
+        
+        # Entries imported from the legacy log only kept a truncated first line
+        if entry["job"] is None:
+            messagebox.showerror(
+                "Cannot Regenerate",
+                "This entry was imported from the old history log, which only kept "
+                "the first 100 characters of the text."
+            )
+            return
+        
+        job = dict(JOB_DEFAULTS)
+        job.update(entry["job"])
+        
+        try:
+            job = normalize_job(job)
+        except ValueError as e:
+            messagebox.showerror("Validation Error", str(e))
+            return
+        
+        self.start_generation(job)
+    
     def update_progress(self, message: str):
         """Update progress status"""
         self.status_label.configure(text=f"Status: {message}")
@@ -489,8 +702,11 @@ class AudioGeneratorApp(ctk.CTk):
     def update_status(self):
         """Update status bar"""
         self.status_label.configure(text="Status: Ready")
+        latency = ""
+        if self.engine and self.engine.request_count:
+            latency = f" | Latency: {self.engine.latency_summary()}"
         self.api_usage_label.configure(
-            text=f"API Calls Today: {self.generation_count}/~{config.FREE_TIER_DAILY_ESTIMATE}"
+            text=f"API Calls Today: {self.generation_count}/~{config.FREE_TIER_DAILY_ESTIMATE}{latency}"
         )
     
     def load_settings(self):
@@ -511,6 +727,19 @@ class AudioGeneratorApp(ctk.CTk):
                     output_dir = settings.get("output_dir")
                     if output_dir:
                         self.output_dir = Path(output_dir)
+                    
+                    # Load output format
+                    output_format = settings.get("output_format")
+                    if output_format in config.OUTPUT_FORMATS:
+                        self.output_format = output_format
+                    
+                    # Load delivery profile
+                    delivery_profile = settings.get("delivery_profile")
+                    if delivery_profile in config.DELIVERY_PROFILES:
+                        self.delivery_profile = delivery_profile
+                    
+                    # Load caption setting
+                    self.captions_enabled = settings.get("captions", self.captions_enabled)
             except Exception as e:
                 print(f"Error loading settings: {e}")
     
@@ -519,7 +748,10 @@ class AudioGeneratorApp(ctk.CTk):
         settings = {
             "generation_count": self.generation_count,
             "last_date": datetime.now().strftime("%Y-%m-%d"),
-            "output_dir": str(self.output_dir)
+            "output_dir": str(self.output_dir),
+            "output_format": self.output_format,
+            "delivery_profile": self.delivery_profile,
+            "captions": self.captions_enabled
         }
         
         try:
@@ -1,26 +1,148 @@
 """
 Core audio generation engine using Google Gemini TTS API
 """
+import threading
+import time
 import wave
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Optional, Union
+import httpx
 from google import genai
 from google.genai import types
 import config
+from budget import MemoryBudget, Reservation
+from captions import spoken_text, write_captions
+from cassette import CassetteClient
+from delivery import check_profile_format, convert_pcm
+from encoders import EncoderPool, get_default_pool
+from utils import estimate_audio_duration
+
+
+# Long-lived API clients, one per key, shared by every engine in the process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str) -> genai.Client:
+    """
+    Shared API client for a key
+    
+    The client keeps idle connections open (config.CLIENT_KEEPALIVE_SECONDS),
+    so new engines and requests after a pause reuse an established
+    connection instead of paying DNS/TCP/TLS setup again.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(client_args={
+                    "limits": httpx.Limits(
+                        max_connections=config.CLIENT_MAX_CONNECTIONS,
+                        max_keepalive_connections=config.CLIENT_MAX_CONNECTIONS,
+                        keepalive_expiry=config.CLIENT_KEEPALIVE_SECONDS,
+                    )
+                })
+            )
+            _clients[api_key] = client
+        return client
 
 
 class AudioEngine:
     """Audio generation engine for Gemini TTS"""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        encoder_pool: Optional[EncoderPool] = None,
+        cassette_mode: str = config.CASSETTE_MODE,
+        cassette_file: Path = config.CASSETTE_FILE,
+        replay_latency: bool = config.CASSETTE_REPLAY_LATENCY,
+        delivery_profile: str = "native",
+        caption_formats: tuple[str, ...] = config.CAPTIONS,
+        memory_budget: Optional[MemoryBudget] = None
+    ):
         """
         Initialize the audio engine
         
         Args:
-            api_key: Google Gemini API key
+            api_key: Google Gemini API key (not needed in replay mode)
+            encoder_pool: Process pool for compressed formats (default: shared pool)
+            cassette_mode: "" for live calls, "record" or "replay" (see cassette.py)
+            cassette_file: Cassette file for record/replay mode
+            replay_latency: In replay mode, reproduce the recorded latencies
+            delivery_profile: Output rate/channels/sample format (from config.DELIVERY_PROFILES)
+            caption_formats: Caption files to write next to each render ("srt", "vtt", "json")
+            memory_budget: Limit on audio held by concurrent renders (default: unlimited)
         """
-        self.client = genai.Client(api_key=api_key)
+        if cassette_mode == "replay":
+            # Served entirely from the cassette, no network client
+            self.client = CassetteClient("replay", cassette_file, simulate_latency=replay_latency)
+        elif cassette_mode == "record":
+            self.client = CassetteClient("record", cassette_file, client=get_client(api_key))
+        else:
+            self.client = get_client(api_key)
+        self.cassette_mode = cassette_mode
+        self.encoder_pool = encoder_pool
+        self.delivery_profile = delivery_profile
+        self.caption_formats = caption_formats
+        self.memory_budget = memory_budget or MemoryBudget()
         self.request_count = 0
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "first_request_seconds": None,
+            "steady_requests": 0,
+            "steady_seconds": 0.0,
+            "prewarm_seconds": None,
+        }
+    
+    def prewarm(self, model: Optional[str] = None, wait: bool = False) -> Optional[threading.Thread]:
+        """
+        Open the API connection before the first request, in the background
+        
+        Makes one cheap metadata request, so DNS lookup, TCP and TLS setup
+        are done by the time the first generate call is made. Errors are
+        ignored: the connection is warm even if the request is refused.
+        
+        Args:
+            model: Model to look up (default: the first configured model)
+            wait: Block until the connection is open
+        
+        Returns:
+            The prewarm thread, or None in replay mode (no network)
+        """
+        if self.cassette_mode == "replay":
+            return None
+        
+        def warm():
+            start = time.perf_counter()
+            try:
+                self.client.models.get(model=model or list(config.MODELS.values())[0])
+            except Exception:
+                pass
+            with self._stats_lock:
+                self.stats["prewarm_seconds"] = time.perf_counter() - start
+        
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+    
+    def latency_summary(self) -> str:
+        """Human-readable first-request vs. steady-state API latency"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if stats["first_request_seconds"] is None:
+            return "No requests yet"
+        
+        summary = f"first request {stats['first_request_seconds']:.2f}s"
+        if stats["steady_requests"]:
+            average = stats["steady_seconds"] / stats["steady_requests"]
+            summary += f", then {average:.2f}s avg over {stats['steady_requests']} requests"
+        if stats["prewarm_seconds"] is not None:
+            summary += f" (prewarmed in {stats['prewarm_seconds']:.2f}s)"
+        return summary
     
     def generate_single_speaker(
         self,
@@ -28,7 +150,8 @@ class AudioEngine:
         voice: str,
         model: str = "gemini-2.5-flash-preview-tts",
         output_path: Optional[Path] = None,
-        progress_callback: Optional[Callable[[str], None]] = None
+        progress_callback: Optional[Callable[[str], None]] = None,
+        cached_content: Optional[str] = None
     ) -> Path:
         """
         Generate single-speaker audio
@@ -39,46 +162,36 @@ class AudioEngine:
             model: Model to use
             output_path: Output file path (optional)
             progress_callback: Callback function for progress updates
+            cached_content: Cached prompt prefix to prepend on the server (see styles.py)
         
         Returns:
             Path to the generated audio file
         """
         try:
+            self._check_output_format(output_path)
+            
             if progress_callback:
                 progress_callback("Generating audio with Gemini TTS...")
             
-            # Generate content with audio modality
-            response = self.client.models.generate_content(
-                model=model,
-                contents=text,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=voice,
-                            )
-                        )
-                    ),
+            # Generate content, once the audio fits in the memory budget
+            with self._reserve_memory(estimate_audio_duration(spoken_text(text)),
+                                      progress_callback) as reservation:
+                audio_data = self._synthesize(
+                    text, model, self._single_speaker_config(voice), cached_content
                 )
-            )
-            
-            # Extract audio data
-            audio_data = response.candidates[0].content.parts[0].inline_data.data
+                duration = self._duration(audio_data)
+                reservation.resize(self._memory_needed(duration))
+                
+                if progress_callback:
+                    progress_callback(f"Saving audio file... ({self.memory_budget.usage()})")
+                
+                # Save to WAV or compressed file
+                if output_path is None:
+                    output_path = config.DEFAULT_OUTPUT_DIR / "output.wav"
+                
+                self._save_audio(output_path, audio_data, progress_callback)
             
-            if progress_callback:
-                progress_callback("Saving audio file...")
-            
-            # Save to WAV file
-            if output_path is None:
-                output_path = config.DEFAULT_OUTPUT_DIR / "output.wav"
-            
-            self._save_wave_file(output_path, audio_data)
-            
-            self.request_count += 1
-            
-            if progress_callback:
-                progress_callback(f"Audio saved successfully: {output_path.name}")
+            self._write_captions(output_path, [(text, 0.0, duration)], duration)
             
             return output_path
             
@@ -93,7 +206,8 @@ class AudioEngine:
         speakers: list[dict],
         model: str = "gemini-2.5-flash-preview-tts",
         output_path: Optional[Path] = None,
-        progress_callback: Optional[Callable[[str], None]] = None
+        progress_callback: Optional[Callable[[str], None]] = None,
+        cached_content: Optional[str] = None
     ) -> Path:
         """
         Generate multi-speaker audio (up to 2 speakers)
@@ -104,60 +218,115 @@ class AudioEngine:
             model: Model to use
             output_path: Output file path (optional)
             progress_callback: Callback function for progress updates
+            cached_content: Cached prompt prefix to prepend on the server (see styles.py)
         
         Returns:
             Path to the generated audio file
         """
         try:
+            self._check_output_format(output_path)
+            
             if progress_callback:
                 progress_callback("Generating multi-speaker audio...")
             
-            # Create speaker voice configs
-            speaker_configs = []
-            for speaker in speakers[:2]:  # Max 2 speakers
-                speaker_configs.append(
-                    types.SpeakerVoiceConfig(
-                        speaker=speaker["name"],
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=speaker["voice"]
-                            )
-                        )
-                    )
+            # Generate content, once the audio fits in the memory budget
+            with self._reserve_memory(estimate_audio_duration(spoken_text(text)),
+                                      progress_callback) as reservation:
+                audio_data = self._synthesize(
+                    text, model, self._multi_speaker_config(speakers), cached_content
                 )
+                duration = self._duration(audio_data)
+                reservation.resize(self._memory_needed(duration))
+                
+                if progress_callback:
+                    progress_callback(f"Saving audio file... ({self.memory_budget.usage()})")
+                
+                # Save to WAV or compressed file
+                if output_path is None:
+                    output_path = config.DEFAULT_OUTPUT_DIR / "output.wav"
+                
+                self._save_audio(output_path, audio_data, progress_callback)
             
-            # Generate content
-            response = self.client.models.generate_content(
-                model=model,
-                contents=text,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
-                                speakers=speaker_configs
-                            )
-                        )
-                    ),
-                )
-            )
+            self._write_captions(output_path, [(text, 0.0, duration)], duration)
             
-            # Extract audio data
-            audio_data = response.candidates[0].content.parts[0].inline_data.data
+            return output_path
             
+        except Exception as e:
             if progress_callback:
-                progress_callback("Saving audio file...")
+                progress_callback(f"Error: {str(e)}")
+            raise
+    
+    def generate_segments(
+        self,
+        segments: list[Union[str, float]],
+        voice: Optional[str] = None,
+        speakers: Optional[list[dict]] = None,
+        model: str = "gemini-2.5-flash-preview-tts",
+        output_path: Optional[Path] = None,
+        progress_callback: Optional[Callable[[str], None]] = None,
+        cached_content: Optional[str] = None
+    ) -> Path:
+        """
+        Generate audio from spoken pieces separated by exact pauses
+        
+        Only the text pieces are sent to the API; pauses are rendered
+        locally as zero PCM when the pieces are stitched together.
+        
+        Args:
+            segments: Text pieces and pause lengths in seconds (see utils.split_pause_markers)
+            voice: Voice name for single-speaker audio
+            speakers: Speaker configs for multi-speaker audio (overrides voice)
+            model: Model to use
+            output_path: Output file path (optional)
+            progress_callback: Callback function for progress updates
+            cached_content: Cached prompt prefix to prepend on the server (see styles.py)
+        
+        Returns:
+            Path to the generated audio file
+        """
+        try:
+            self._check_output_format(output_path)
             
-            # Save to WAV file
-            if output_path is None:
-                output_path = config.DEFAULT_OUTPUT_DIR / "output.wav"
+            if speakers:
+                speech_config = self._multi_speaker_config(speakers)
+            else:
+                speech_config = self._single_speaker_config(voice)
             
-            self._save_wave_file(output_path, audio_data)
+            spoken_total = sum(1 for segment in segments if isinstance(segment, str))
+            spoken_done = 0
+            chunks = []
+            spans = []
+            position = 0.0
+            estimate = sum(
+                estimate_audio_duration(spoken_text(segment)) if isinstance(segment, str) else segment
+                for segment in segments
+            )
             
-            self.request_count += 1
+            # Hold off the first request until the whole job fits in the memory budget
+            with self._reserve_memory(estimate, progress_callback) as reservation:
+                for segment in segments:
+                    if isinstance(segment, str):
+                        spoken_done += 1
+                        if progress_callback:
+                            progress_callback(f"Generating segment {spoken_done}/{spoken_total}...")
+                        chunks.append(self._synthesize(segment, model, speech_config, cached_content))
+                        # Exact segment times, straight from the PCM length
+                        spans.append((segment, position, position + self._duration(chunks[-1])))
+                    else:
+                        chunks.append(self._silence(segment))
+                    position += self._duration(chunks[-1])
+                    reservation.resize(max(reservation.nbytes, self._memory_needed(position)))
+                
+                if progress_callback:
+                    progress_callback(f"Saving audio file... ({self.memory_budget.usage()})")
+                
+                if output_path is None:
+                    output_path = config.DEFAULT_OUTPUT_DIR / "output.wav"
+                
+                self._save_audio(output_path, b"".join(chunks), progress_callback)
+                chunks.clear()
             
-            if progress_callback:
-                progress_callback(f"Audio saved successfully: {output_path.name}")
+            self._write_captions(output_path, spans, position)
             
             return output_path
             
@@ -166,6 +335,189 @@ class AudioEngine:
                 progress_callback(f"Error: {str(e)}")
             raise
     
+    def _single_speaker_config(self, voice: str) -> types.SpeechConfig:
+        """Build the speech config for a single prebuilt voice"""
+        return types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=voice,
+                )
+            )
+        )
+    
+    def _multi_speaker_config(self, speakers: list[dict]) -> types.SpeechConfig:
+        """Build the speech config for up to 2 named speakers"""
+        speaker_configs = []
+        for speaker in speakers[:2]:  # Max 2 speakers
+            speaker_configs.append(
+                types.SpeakerVoiceConfig(
+                    speaker=speaker["name"],
+                    voice_config=types.VoiceConfig(
+                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                            voice_name=speaker["voice"]
+                        )
+                    )
+                )
+            )
+        
+        return types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                    speakers=speaker_configs
+                )
+            )
+        )
+    
+    def _synthesize(
+        self,
+        text: str,
+        model: str,
+        speech_config: types.SpeechConfig,
+        cached_content: Optional[str] = None
+    ) -> bytes:
+        """
+        Make one TTS request and return the raw PCM audio
+        
+        Args:
+            text: Text (or full prompt) to speak
+            model: Model to use
+            speech_config: Voice configuration
+            cached_content: Name of a server-side cached prompt prefix (optional)
+        
+        Returns:
+            16-bit PCM audio data
+        """
+        start = time.perf_counter()
+        response = self.client.models.generate_content(
+            model=model,
+            contents=text,
+            config=types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=speech_config,
+                cached_content=cached_content,
+            )
+        )
+        latency = time.perf_counter() - start
+        
+        with self._stats_lock:
+            self.request_count += 1
+            if self.stats["first_request_seconds"] is None:
+                self.stats["first_request_seconds"] = latency
+            else:
+                self.stats["steady_requests"] += 1
+                self.stats["steady_seconds"] += latency
+        
+        # Extract audio data
+        return response.candidates[0].content.parts[0].inline_data.data
+    
+    def _silence(
+        self,
+        seconds: float,
+        channels: int = config.AUDIO_CHANNELS,
+        rate: int = config.AUDIO_SAMPLE_RATE,
+        sample_width: int = config.AUDIO_SAMPLE_WIDTH
+    ) -> bytes:
+        """Zero PCM of an exact length, rounded to the nearest sample"""
+        frames = int(round(seconds * rate))
+        return bytes(frames * channels * sample_width)
+    
+    def _check_output_format(self, output_path: Optional[Path]):
+        """Fail before any API call if the delivery profile can't be saved in this format"""
+        if output_path is not None and output_path.suffix:
+            check_profile_format(self.delivery_profile, output_path.suffix.lstrip("."))
+    
+    def _memory_needed(self, seconds: float) -> int:
+        """
+        Bytes a render of this length holds before its file is written
+        
+        The response payload and the stitched PCM at the native rate, plus
+        the copy converted for the delivery profile.
+        """
+        profile = config.DELIVERY_PROFILES[self.delivery_profile]
+        native_rate = config.AUDIO_SAMPLE_RATE * config.AUDIO_CHANNELS * config.AUDIO_SAMPLE_WIDTH
+        profile_rate = profile["rate"] * profile["channels"] * config.AUDIO_SAMPLE_WIDTH
+        return int(seconds * (2 * native_rate + profile_rate))
+    
+    def _reserve_memory(
+        self,
+        seconds: float,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> Reservation:
+        """Reserve memory for a render of an estimated length, waiting if the budget is full"""
+        return self.memory_budget.reserve(self._memory_needed(seconds), progress_callback)
+    
+    def _duration(
+        self,
+        pcm_data: bytes,
+        channels: int = config.AUDIO_CHANNELS,
+        rate: int = config.AUDIO_SAMPLE_RATE,
+        sample_width: int = config.AUDIO_SAMPLE_WIDTH
+    ) -> float:
+        """Length of PCM data in seconds"""
+        return len(pcm_data) / (rate * channels * sample_width)
+    
+    def _write_captions(self, output_path: Path, spans: list[tuple[str, float, float]], duration: float):
+        """
+        Write caption files for a render (see captions.py)
+        
+        Args:
+            output_path: Audio file path
+            spans: (prompt, start, end) for each synthesized request, in seconds
+            duration: Total audio length in seconds
+        """
+        if not self.caption_formats or not spans:
+            return
+        write_captions(
+            output_path,
+            [(spoken_text(text), start, end) for text, start, end in spans],
+            duration,
+            self.caption_formats
+        )
+    
+    def _save_audio(
+        self,
+        output_path: Path,
+        pcm_data: bytes,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Save PCM data in the format given by the output file extension
+        
+        The delivery profile's rate and channel conversion is applied first.
+        Native-profile WAV is written directly; everything else is encoded in
+        the encoder process pool so CPU-bound work stays off this thread.
+        
+        Args:
+            output_path: Output file path
+            pcm_data: PCM audio data
+            progress_callback: Callback function for progress updates
+        """
+        profile = config.DELIVERY_PROFILES[self.delivery_profile]
+        if self.delivery_profile != "native":
+            if progress_callback:
+                progress_callback(f"Converting to {self.delivery_profile} profile...")
+            pcm_data = convert_pcm(pcm_data, profile)
+        
+        if output_path.suffix.lower() in ("", ".wav") and profile["sample_format"] == "pcm16":
+            self._save_wave_file(output_path, pcm_data, profile["channels"], profile["rate"])
+            if progress_callback:
+                progress_callback(f"Audio saved successfully: {output_path.name}")
+            return
+        
+        if progress_callback:
+            progress_callback(f"Encoding {output_path.suffix.lstrip('.').upper()}...")
+        
+        pool = self.encoder_pool or get_default_pool()
+        stats = pool.encode(
+            pcm_data, output_path, profile["rate"], profile["channels"], profile["sample_format"]
+        )
+        
+        if progress_callback:
+            ratio = stats["input_bytes"] / max(stats["output_bytes"], 1)
+            progress_callback(
+                f"Audio saved successfully: {output_path.name} ({ratio:.1f}x smaller than WAV)"
+            )
+    
     def _save_wave_file(
         self,
         filename: Path,
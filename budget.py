@@ -0,0 +1,143 @@
+"""
+Memory budget for audio held in flight by concurrent renders
+
+Each render reserves an estimate of the bytes it will hold (response
+payload, stitched PCM and the converted copy) before its first API
+call, corrects the reservation once the real audio is known, and
+releases it after the file is written. When the budget is used up, new
+renders wait before calling the API, so peak memory is set by the
+budget rather than by how many jobs are queued.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from utils import format_file_size
+
+
+class Reservation:
+    """Bytes held by one render; release it when the audio is written"""
+
+    def __init__(self, budget: "MemoryBudget", nbytes: int):
+        self._budget = budget
+        self.nbytes = nbytes
+
+    def resize(self, nbytes: int):
+        """
+        Change the reserved size to the actual need
+
+        Never blocks, even past the limit: a render that already holds
+        audio must be able to finish and release it.
+        """
+        self._budget._adjust(nbytes - self.nbytes)
+        self.nbytes = nbytes
+
+    def release(self):
+        """Return the reserved bytes to the budget"""
+        self.resize(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class MemoryBudget:
+    """Limits the audio bytes held by renders at the same time"""
+
+    def __init__(
+        self,
+        limit_bytes: Optional[int] = None,
+        on_wait: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the budget
+
+        Args:
+            limit_bytes: Bytes allowed in flight (None: unlimited, usage is still tracked)
+            on_wait: Called with the current usage when a render has to wait
+        """
+        self.limit_bytes = limit_bytes
+        self.on_wait = on_wait
+        self.in_use = 0
+        self._condition = threading.Condition()
+        self.stats = {
+            "reservations": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "peak_bytes": 0,
+        }
+
+    def reserve(
+        self,
+        nbytes: int,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> Reservation:
+        """
+        Reserve bytes, waiting until they fit in the budget
+
+        A reservation larger than the whole budget is let through once
+        nothing else is in flight, so oversized jobs still run (alone).
+
+        Args:
+            nbytes: Estimated bytes the render will hold
+            progress_callback: Callback function for progress updates
+
+        Returns:
+            Reservation to resize and release
+        """
+        with self._condition:
+            fits = self._fits(nbytes)
+            usage = self._usage()
+        if not fits:
+            message = f"Memory budget full ({usage}), waiting before the next request..."
+            for callback in (self.on_wait, progress_callback):
+                if callback:
+                    callback(message)
+
+        with self._condition:
+            if not self._fits(nbytes):
+                start = time.perf_counter()
+                self.stats["waits"] += 1
+                self._condition.wait_for(lambda: self._fits(nbytes))
+                self.stats["wait_seconds"] += time.perf_counter() - start
+            self.stats["reservations"] += 1
+            self._add(nbytes)
+        return Reservation(self, nbytes)
+
+    def usage(self) -> str:
+        """Bytes in flight, e.g. "120.5 MB of 512.0 MB in flight" """
+        with self._condition:
+            return self._usage()
+
+    def _usage(self) -> str:
+        if self.limit_bytes is None:
+            return f"{format_file_size(self.in_use)} in flight"
+        return f"{format_file_size(self.in_use)} of {format_file_size(self.limit_bytes)} in flight"
+
+    def summary(self) -> str:
+        """Human-readable peak usage and time spent waiting"""
+        with self._condition:
+            stats = dict(self.stats)
+        limit = "unlimited" if self.limit_bytes is None else format_file_size(self.limit_bytes)
+        return (
+            f"peak {format_file_size(stats['peak_bytes'])} (budget {limit}), "
+            f"{stats['waits']} of {stats['reservations']} renders waited "
+            f"{stats['wait_seconds']:.1f}s in total"
+        )
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.limit_bytes is None or self.in_use == 0:
+            return True
+        return self.in_use + nbytes <= self.limit_bytes
+
+    def _add(self, nbytes: int):
+        self.in_use += nbytes
+        self.stats["peak_bytes"] = max(self.stats["peak_bytes"], self.in_use)
+
+    def _adjust(self, delta: int):
+        with self._condition:
+            self._add(delta)
+            if delta < 0:
+                self._condition.notify_all()
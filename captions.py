@@ -0,0 +1,242 @@
+"""
+Caption files (SRT, WebVTT) and a JSON timing map for rendered audio
+
+Timings come from the audio itself rather than a separate alignment
+pass. When text is synthesized in segments, each segment's PCM length
+gives its exact start and end. Inside a segment (or for a render made in
+a single API call), sentence times are estimated in proportion to their
+character counts.
+"""
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+CAPTION_FORMATS = ("srt", "vtt", "json")
+
+# Advanced-mode prompts end with the spoken text under this heading
+TRANSCRIPT_HEADING = re.compile(r"^#### TRANSCRIPT\n", re.MULTILINE)
+
+# A sentence: text up to terminal punctuation (plus closing quotes/brackets) or the line end
+SENTENCE = re.compile(r"\S.*?(?:[.!?…]+[\"'”’)\]]*(?=\s|$)|[。！？]+[」』）]*|$)")
+
+# Longest caption line before a sentence is split at a comma or space
+MAX_CUE_CHARS = 84
+
+
+def spoken_text(prompt: str) -> str:
+    """The text that is actually spoken, without advanced-mode headings"""
+    return TRANSCRIPT_HEADING.split(prompt)[-1].strip()
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Split text into caption-sized pieces
+
+    Lines (e.g. dialogue turns) are split into sentences, and sentences
+    longer than MAX_CUE_CHARS are split at commas or spaces.
+    """
+    pieces = []
+    for line in text.splitlines():
+        for sentence in SENTENCE.findall(line):
+            sentence = " ".join(sentence.split())
+            while len(sentence) > MAX_CUE_CHARS:
+                cut = sentence.rfind(", ", 0, MAX_CUE_CHARS)
+                cut = cut + 1 if cut > 0 else sentence.rfind(" ", 0, MAX_CUE_CHARS)
+                if cut <= 0:
+                    break
+                pieces.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+    return pieces
+
+
+def build_cues(spans: Iterable[tuple[str, float, float]]) -> list[dict]:
+    """
+    Turn timed text spans into sentence cues
+
+    Args:
+        spans: (text, start, end) for each synthesized segment, in seconds
+
+    Returns:
+        Cues with start, end, text and exact (True if both ends are
+        segment boundaries measured from the PCM)
+    """
+    cues = []
+    for text, start, end in spans:
+        sentences = split_sentences(text)
+        total_chars = sum(len(sentence) for sentence in sentences)
+        if not total_chars:
+            continue
+
+        position = start
+        chars_done = 0
+        for number, sentence in enumerate(sentences):
+            chars_done += len(sentence)
+            cue_end = end if number == len(sentences) - 1 else start + (end - start) * chars_done / total_chars
+            cues.append({
+                "start": round(position, 3),
+                "end": round(cue_end, 3),
+                "text": sentence,
+                "exact": len(sentences) == 1,
+            })
+            position = cue_end
+    return cues
+
+
+def format_timestamp(seconds: float, decimal_separator: str = ",") -> str:
+    """HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT)"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_separator}{milliseconds:03d}"
+
+
+def to_srt(cues: list[dict]) -> str:
+    """SubRip captions"""
+    blocks = [
+        f"{number}\n{format_timestamp(cue['start'])} --> {format_timestamp(cue['end'])}\n{cue['text']}\n"
+        for number, cue in enumerate(cues, 1)
+    ]
+    return "\n".join(blocks)
+
+
+def to_vtt(cues: list[dict]) -> str:
+    """WebVTT captions"""
+    blocks = ["WEBVTT\n"] + [
+        f"{format_timestamp(cue['start'], '.')} --> {format_timestamp(cue['end'], '.')}\n{cue['text']}\n"
+        for cue in cues
+    ]
+    return "\n".join(blocks)
+
+
+def caption_path(audio_path: Path, fmt: str) -> Path:
+    """Caption file next to the audio (name.srt, name.vtt, name.timing.json)"""
+    audio_path = Path(audio_path)
+    if fmt == "json":
+        return audio_path.with_name(f"{audio_path.stem}.timing.json")
+    return audio_path.with_suffix(f".{fmt}")
+
+
+def write_captions(
+    audio_path: Path,
+    spans: list[tuple[str, float, float]],
+    duration: float,
+    formats: Iterable[str] = CAPTION_FORMATS
+) -> list[Path]:
+    """
+    Write caption files and the timing map next to an audio file
+
+    Args:
+        audio_path: Rendered audio file
+        spans: (text, start, end) for each synthesized segment, in seconds
+        duration: Total audio length in seconds (including pauses)
+        formats: Any of "srt", "vtt" and "json"
+
+    Returns:
+        Paths of the written files
+    """
+    cues = build_cues(spans)
+    written = []
+    for fmt in formats:
+        path = caption_path(audio_path, fmt)
+        if fmt == "srt":
+            content = to_srt(cues)
+        elif fmt == "vtt":
+            content = to_vtt(cues)
+        elif fmt == "json":
+            content = json.dumps({
+                "audio": Path(audio_path).name,
+                "duration": round(duration, 3),
+                "segments": [
+                    {"start": round(start, 3), "end": round(end, 3), "text": text}
+                    for text, start, end in spans
+                ],
+                "cues": cues,
+            }, indent=2, ensure_ascii=False)
+        else:
+            raise ValueError(f"Unknown caption format: {fmt}")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        written.append(path)
+    return written
+
+
+def copy_captions(source_audio: Path, target_audio: Path, move: bool = False) -> list[Path]:
+    """
+    Copy (or move) the caption files of a render to go with another audio file
+
+    The timing map's "audio" entry is rewritten to name the new file.
+
+    Args:
+        source_audio: Audio file the captions were written for
+        target_audio: Audio file they should go with
+        move: Remove the source caption files (e.g. after renaming a partial render)
+
+    Returns:
+        Paths of the written files
+    """
+    written = []
+    for fmt in CAPTION_FORMATS:
+        source = caption_path(source_audio, fmt)
+        if not source.exists():
+            continue
+        target = caption_path(target_audio, fmt)
+        if fmt == "json":
+            with open(source, "r", encoding="utf-8") as f:
+                timing = json.load(f)
+            timing["audio"] = Path(target_audio).name
+            # When moving, rewrite in place first so the target appears complete
+            with open(source if move else target, "w", encoding="utf-8") as f:
+                f.write(json.dumps(timing, indent=2, ensure_ascii=False))
+        if move:
+            os.replace(source, target)
+        elif fmt != "json":
+            shutil.copyfile(source, target)
+        written.append(target)
+    return written
+
+
+def load_spoken_text(audio_path: Path) -> Optional[str]:
+    """
+    Rebuild the spoken text of a render from its timing map
+
+    Gaps between segments become pause markers, so the expected duration
+    of the text matches the audio (see analysis.expected_duration).
+
+    Returns:
+        Text with pause markers, or None if there is no timing map
+    """
+    path = caption_path(audio_path, "json")
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        timing = json.load(f)
+
+    pieces = []
+    position = 0.0
+    for segment in timing["segments"]:
+        if segment["start"] - position > 0.001:
+            pieces.append(f"[pause {segment['start'] - position:.3f}s]")
+        pieces.append(segment["text"])
+        position = segment["end"]
+    if timing["duration"] - position > 0.001:
+        pieces.append(f"[pause {timing['duration'] - position:.3f}s]")
+    return " ".join(pieces) or None
+
+
+def parse_formats(value: str) -> tuple[str, ...]:
+    """Parse a comma-separated format list ("srt,vtt,json"; "" or "none" for none)"""
+    formats = tuple(fmt.strip().lower() for fmt in value.split(",") if fmt.strip())
+    if formats in ((), ("none",)):
+        return ()
+    unknown = [fmt for fmt in formats if fmt not in CAPTION_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown caption format: {', '.join(unknown)}")
+    return formats
@@ -0,0 +1,191 @@
+"""
+Record/replay layer for Gemini TTS responses
+
+In record mode every generate_content call goes to the API and the
+response audio is stored in a cassette file keyed by a fingerprint of
+the request. In replay mode the same requests are served from the
+cassette with no network access at all.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from google.genai import types
+
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded"""
+
+
+def fingerprint(model: str, contents: Any, config: Optional[types.GenerateContentConfig] = None) -> str:
+    """
+    Create a stable fingerprint for a generate_content request
+
+    Args:
+        model: Model name
+        contents: Request contents (usually the prompt string)
+        config: Generation config
+
+    Returns:
+        Hex SHA-256 digest of the canonical request
+    """
+    if isinstance(config, types.GenerateContentConfig):
+        config = config.model_dump(mode="json", exclude_none=True)
+    if hasattr(contents, "model_dump"):
+        contents = contents.model_dump(mode="json", exclude_none=True)
+
+    request = json.dumps(
+        {"model": model, "contents": contents, "config": config},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """SQLite file holding recorded responses, with zlib-compressed audio"""
+
+    def __init__(self, cassette_file: Path):
+        """
+        Open (or create) a cassette file
+
+        Args:
+            cassette_file: SQLite file path
+        """
+        self.cassette_file = Path(cassette_file)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cassette_file), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                fingerprint TEXT PRIMARY KEY,
+                model TEXT,
+                mime_type TEXT,
+                audio BLOB,
+                latency REAL,
+                recorded_at TEXT
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a recorded response
+
+        Returns:
+            Dict with audio bytes, mime_type and latency, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mime_type, audio, latency FROM responses WHERE fingerprint = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"mime_type": row[0], "audio": zlib.decompress(row[1]), "latency": row[2]}
+
+    def put(self, key: str, model: str, audio: bytes, mime_type: str, latency: float):
+        """Record (or overwrite) a response"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, mime_type, zlib.compress(audio, 6), latency,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+
+class _RecordingModels:
+    """Pass-through to the real API that records each response"""
+
+    def __init__(self, models, store: CassetteStore):
+        self._models = models
+        self._store = store
+
+    def generate_content(self, *, model: str, contents: Any, config=None, **kwargs):
+        start = time.perf_counter()
+        response = self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        latency = time.perf_counter() - start
+
+        blob = response.candidates[0].content.parts[0].inline_data
+        self._store.put(fingerprint(model, contents, config), model, blob.data, blob.mime_type, latency)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _ReplayModels:
+    """Serves recorded responses without touching the network"""
+
+    def __init__(self, store: CassetteStore, simulate_latency: bool = False):
+        self._store = store
+        self._simulate_latency = simulate_latency
+
+    def generate_content(self, *, model: str, contents: Any, config=None, **kwargs):
+        key = fingerprint(model, contents, config)
+        recorded = self._store.get(key)
+        if recorded is None:
+            raise CassetteMiss(f"No recorded response for request {key[:12]} "
+                               f"in {self._store.cassette_file.name}")
+
+        if self._simulate_latency and recorded["latency"]:
+            time.sleep(recorded["latency"])
+
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(
+                    role="model",
+                    parts=[types.Part(inline_data=types.Blob(
+                        data=recorded["audio"],
+                        mime_type=recorded["mime_type"]
+                    ))]
+                )
+            )]
+        )
+
+
+class CassetteClient:
+    """Drop-in replacement for genai.Client in record or replay mode"""
+
+    def __init__(self, mode: str, cassette_file: Path, client=None, simulate_latency: bool = False):
+        """
+        Initialize the cassette client
+
+        Args:
+            mode: "record" or "replay"
+            cassette_file: Cassette SQLite file path
+            client: Real genai.Client (required for record mode)
+            simulate_latency: In replay mode, sleep for each recorded latency
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and client is None:
+            raise ValueError("Record mode needs a real client")
+
+        self.mode = mode
+        self.store = CassetteStore(cassette_file)
+        self._client = client
+
+        if mode == "record":
+            self.models = _RecordingModels(client.models, self.store)
+        else:
+            self.models = _ReplayModels(self.store, simulate_latency)
+
+    def __getattr__(self, name):
+        if self._client is None:
+            raise AttributeError(f"'{name}' is not available in replay mode")
+        return getattr(self._client, name)
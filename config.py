@@ -59,6 +59,34 @@ AUDIO_SAMPLE_RATE = 24000
 AUDIO_CHANNELS = 1
 AUDIO_SAMPLE_WIDTH = 2  # 16-bit
 
+# Output formats: display name -> file extension
+OUTPUT_FORMATS = {
+    "WAV (Uncompressed)": "wav",
+    "FLAC (Lossless)": "flac",
+    "Ogg Opus (Compressed)": "opus",
+    "MP3 (Compressed)": "mp3",
+}
+
+# Delivery profiles: rate, channels and sample format applied right after synthesis
+DELIVERY_PROFILES = {
+    "native": {"rate": AUDIO_SAMPLE_RATE, "channels": AUDIO_CHANNELS, "sample_format": "pcm16"},
+    "telephony": {"rate": 8000, "channels": 1, "sample_format": "mulaw"},
+    "video": {"rate": 48000, "channels": 2, "sample_format": "pcm16"},
+    "podcast": {"rate": 44100, "channels": 1, "sample_format": "pcm16"},
+}
+
+# Caption files written next to every render (see captions.py): any of srt, vtt, json
+CAPTIONS = tuple(
+    fmt.strip().lower() for fmt in os.getenv("GEMINI_CAPTIONS", "srt,vtt,json").split(",")
+    if fmt.strip() and fmt.strip().lower() != "none"
+)
+
+# Audio bytes concurrent batch renders may hold at once (see budget.py), in MB
+BATCH_MEMORY_BUDGET_MB = int(os.getenv("BATCH_MEMORY_BUDGET_MB", "512"))
+
+# Encoder worker processes (0 = one per CPU core)
+ENCODER_WORKERS = int(os.getenv("ENCODER_WORKERS", "0"))
+
 # Application settings
 DEFAULT_OUTPUT_DIR = Path(__file__).parent / "outputs"
 DEFAULT_OUTPUT_DIR.mkdir(exist_ok=True)
@@ -69,3 +97,25 @@ FREE_TIER_DAILY_ESTIMATE = 1500  # Estimated daily requests
 
 # Settings file
 SETTINGS_FILE = Path(__file__).parent / ".settings.json"
+
+# API client connection pool: idle connections are kept open this long (seconds)
+# so requests after a pause skip DNS/TLS setup
+CLIENT_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_CLIENT_KEEPALIVE", "300"))
+CLIENT_MAX_CONNECTIONS = 32
+
+# Generation history: indexed store (see history.py) and the flat legacy log
+HISTORY_INDEX_FILE = Path(__file__).parent / ".history.db"
+LEGACY_HISTORY_FILE = Path(__file__).parent / "generation_history.txt"
+
+# Record/replay of API responses (see cassette.py)
+# GEMINI_CASSETTE_MODE: "" (live), "record" or "replay"
+CASSETTE_MODE = os.getenv("GEMINI_CASSETTE_MODE", "").strip().lower()
+CASSETTE_FILE = Path(os.getenv("GEMINI_CASSETTE_FILE", Path(__file__).parent / "cassette.db"))
+CASSETTE_REPLAY_LATENCY = os.getenv("GEMINI_CASSETTE_REPLAY_LATENCY", "") == "1"
+
+# Style presets for advanced mode (see styles.py)
+STYLES_FILE = Path(__file__).parent / ".styles.json"
+STYLE_CACHE_TTL = int(os.getenv("GEMINI_STYLE_CACHE_TTL", "3600"))  # Seconds
+
+# Audio QA index (see analysis.py)
+QA_INDEX_FILE = Path(__file__).parent / ".qa_index.db"
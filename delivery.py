@@ -0,0 +1,341 @@
+"""
+Delivery profiles: sample rate, channel and sample format conversion
+
+Usage:
+    python delivery.py outputs --profile telephony --output-dir outputs/telephony
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import gcd
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+import config
+from analysis import AUDIO_EXTENSIONS
+from encoders import SOUNDFILE_FORMATS, check_format
+
+
+# Filter design: taps per polyphase branch on each side, and Kaiser window shape
+HALF_TAPS = 16
+KAISER_BETA = 8.0
+
+# Sample format -> libsndfile subtype
+SAMPLE_FORMATS = {
+    "pcm16": "PCM_16",
+    "mulaw": "ULAW",
+}
+
+
+class PolyphaseResampler:
+    """
+    Streaming rational-ratio resampler
+
+    The input is (conceptually) upsampled by `up`, low-pass filtered and
+    downsampled by `down`, but only the filter taps that touch real input
+    samples are ever computed. Blocks of any size can be fed in; the output
+    is the same as resampling the whole signal at once.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1):
+        """
+        Initialize the resampler
+
+        Args:
+            in_rate: Input sample rate
+            out_rate: Output sample rate
+            channels: Number of channels
+        """
+        divisor = gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.channels = channels
+
+        # Windowed-sinc low-pass at the lower of the two Nyquist frequencies
+        factor = max(self.up, self.down)
+        length = 2 * HALF_TAPS * factor + 1
+        n = np.arange(length) - (length - 1) / 2
+        taps = np.sinc(n / factor) * np.kaiser(length, KAISER_BETA)
+        taps *= self.up / taps.sum()
+
+        # Split into polyphase branches: phases[p, k] = taps[p + k * up]
+        self.taps_per_phase = -(-length // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:length] = taps
+        self.phases = padded.reshape(self.taps_per_phase, self.up).T.astype(np.float32)
+
+        self.delay = (length - 1) // 2
+        self.reset()
+
+    def reset(self):
+        """Start a new stream"""
+        history = self.taps_per_phase - 1
+        self._buffer = np.zeros((history, self.channels), dtype=np.float32)
+        self._buffer_start = -history   # Input index of _buffer[0]
+        self._inputs = 0                # Input frames received so far
+        self._outputs = 0               # Output frames produced so far
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Resample the next block of input
+
+        Args:
+            block: float32 array of shape (frames, channels)
+
+        Returns:
+            float32 array of output frames that are now fully determined
+        """
+        self._buffer = np.concatenate([self._buffer, block.astype(np.float32, copy=False)])
+        self._inputs += len(block)
+        return self._run(self._inputs - 1)
+
+    def flush(self) -> np.ndarray:
+        """Emit the remaining output, treating the input as zero after its end"""
+        total = -(-self._inputs * self.up // self.down)
+        padding = np.zeros((self.taps_per_phase + self.delay // self.up + 1, self.channels),
+                           dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, padding])
+        output = self._run(self._buffer_start + len(self._buffer) - 1)
+        return output[:max(0, total - (self._outputs - len(output)))]
+
+    def _run(self, last_input: int) -> np.ndarray:
+        """Compute every output frame whose newest input index is <= last_input"""
+        # Output m needs input index (m * down + delay) // up
+        end = ((last_input + 1) * self.up - self.delay - 1) // self.down + 1
+        if end <= self._outputs:
+            return np.zeros((0, self.channels), dtype=np.float32)
+
+        t = np.arange(self._outputs, end, dtype=np.int64) * self.down + self.delay
+        oldest = t // self.up - self._buffer_start - (self.taps_per_phase - 1)
+
+        # windows[i] holds the taps_per_phase inputs ending at buffer index i + taps - 1
+        windows = np.lib.stride_tricks.sliding_window_view(
+            self._buffer, self.taps_per_phase, axis=0
+        )
+
+        # Outputs m, m + up, m + 2*up, ... share a filter phase, so each phase
+        # is one gather and one matrix-vector product
+        output = np.empty((len(t), self.channels), dtype=np.float32)
+        for first in range(min(self.up, len(t))):
+            phase = t[first] % self.up
+            output[first::self.up] = windows[oldest[first::self.up]] @ self.phases[phase, ::-1]
+
+        self._outputs = end
+
+        # Keep only the history the next output still needs
+        oldest_needed = (end * self.down + self.delay) // self.up - (self.taps_per_phase - 1)
+        drop = max(0, oldest_needed - self._buffer_start)
+        self._buffer = self._buffer[drop:]
+        self._buffer_start += drop
+
+        return output
+
+
+def convert_channels(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Down-mix to mono or duplicate mono to more channels"""
+    if samples.shape[1] == channels:
+        return samples
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    if samples.shape[1] == 1:
+        return np.repeat(samples, channels, axis=1)
+    raise ValueError(f"Cannot convert {samples.shape[1]} channels to {channels}")
+
+
+def to_pcm16(samples: np.ndarray) -> np.ndarray:
+    """Convert float samples in [-1, 1) to int16 with clipping"""
+    return np.clip(np.round(samples * 32768), -32768, 32767).astype("<i2")
+
+
+def convert_pcm(
+    pcm_data: bytes,
+    profile: dict,
+    rate: int = config.AUDIO_SAMPLE_RATE,
+    channels: int = config.AUDIO_CHANNELS
+) -> bytes:
+    """
+    Resample and re-channel 16-bit PCM for a delivery profile
+
+    The sample format (e.g. mu-law) is applied by the encoder when the
+    file is written; this returns 16-bit PCM at the profile's rate and
+    channel count.
+
+    Args:
+        pcm_data: 16-bit PCM audio data
+        profile: Delivery profile (see config.DELIVERY_PROFILES)
+        rate: Input sample rate
+        channels: Input channel count
+
+    Returns:
+        16-bit PCM audio data
+    """
+    if profile["rate"] == rate and profile["channels"] == channels:
+        return pcm_data
+
+    samples = np.frombuffer(pcm_data, dtype="<i2").reshape(-1, channels).astype(np.float32) / 32768
+    if profile["rate"] != rate:
+        resampler = PolyphaseResampler(rate, profile["rate"], channels)
+        samples = np.concatenate([resampler.process(samples), resampler.flush()])
+    samples = convert_channels(samples, profile["channels"])
+    return to_pcm16(samples).tobytes()
+
+
+def check_profile_format(profile_name: str, fmt: str):
+    """
+    Check that a delivery profile's audio can be saved in an output format
+
+    E.g. mu-law only fits in WAV, and Opus cannot encode 44.1 kHz audio.
+
+    Args:
+        profile_name: Delivery profile name (see config.DELIVERY_PROFILES)
+        fmt: Output file extension without the dot (e.g. "opus")
+
+    Raises:
+        ValueError: If the profile cannot be saved in the format
+    """
+    profile = config.DELIVERY_PROFILES[profile_name]
+    try:
+        check_format(fmt, profile["rate"], profile["sample_format"])
+    except ValueError as e:
+        raise ValueError(f"The {profile_name} profile cannot be saved as {fmt.upper()}: {e}") from None
+
+
+def delivery_path(source_path: Path, profile: dict, output_dir: Path) -> Path:
+    """Output path for a converted file (mu-law is always delivered as WAV)"""
+    suffix = ".wav" if profile["sample_format"] == "mulaw" else source_path.suffix
+    return Path(output_dir) / f"{source_path.stem}{suffix}"
+
+
+def convert_file(source_path: Path, output_path: Path, profile: dict,
+                 block_frames: int = 65536) -> dict:
+    """
+    Convert an audio file to a delivery profile, streaming block by block
+
+    Memory use is bounded by the block size, whatever the file length.
+
+    Args:
+        source_path: Input audio file
+        output_path: Output audio file (its extension selects the container)
+        profile: Delivery profile (see config.DELIVERY_PROFILES)
+        block_frames: Input frames read per block
+
+    Returns:
+        Conversion stats (durations in seconds)
+    """
+    start = time.perf_counter()
+    info = sf.info(str(source_path))
+    resampler = None
+    if info.samplerate != profile["rate"]:
+        resampler = PolyphaseResampler(info.samplerate, profile["rate"], info.channels)
+
+    extension = Path(output_path).suffix.lstrip(".").lower()
+    check_format(extension, profile["rate"], profile["sample_format"])
+    container, subtype = _container(extension, profile["sample_format"])
+
+    try:
+        with sf.SoundFile(str(output_path), "w", samplerate=profile["rate"],
+                          channels=profile["channels"], format=container, subtype=subtype) as out:
+            for block in sf.blocks(str(source_path), blocksize=block_frames,
+                                   dtype="float32", always_2d=True):
+                if resampler is not None:
+                    block = resampler.process(block)
+                out.write(convert_channels(block, profile["channels"]))
+            if resampler is not None:
+                out.write(convert_channels(resampler.flush(), profile["channels"]))
+    except Exception:
+        # Don't leave a partial file in the delivery directory
+        Path(output_path).unlink(missing_ok=True)
+        raise
+
+    return {
+        "output_path": str(output_path),
+        "audio_seconds": info.frames / info.samplerate,
+        "convert_seconds": time.perf_counter() - start,
+    }
+
+
+def _container(extension: str, sample_format: str) -> tuple[str, str]:
+    """libsndfile container and subtype for an extension and sample format"""
+    if extension == "wav":
+        return "WAV", SAMPLE_FORMATS[sample_format]
+    if sample_format != "pcm16":
+        raise ValueError(f"{sample_format} is only supported in WAV files")
+    if extension not in SOUNDFILE_FORMATS:
+        raise ValueError(f"Unsupported output format: .{extension}")
+    return SOUNDFILE_FORMATS[extension]
+
+
+def convert_directory(
+    directory: Path,
+    profile: dict,
+    output_dir: Path,
+    max_workers: Optional[int] = None,
+    progress_callback=None
+) -> list[dict]:
+    """
+    Convert every audio file in a directory across all CPU cores
+
+    Args:
+        directory: Directory containing audio files
+        profile: Delivery profile (see config.DELIVERY_PROFILES)
+        output_dir: Output directory (must differ from the input directory)
+        max_workers: Number of worker processes (default: one per CPU core)
+        progress_callback: Callback function for progress updates
+
+    Returns:
+        Conversion stats for each converted file
+    """
+    directory = Path(directory)
+    output_dir = Path(output_dir)
+    if output_dir.resolve() == directory.resolve():
+        raise ValueError("Output directory must differ from the input directory")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = [p for p in sorted(directory.iterdir()) if p.suffix.lower() in AUDIO_EXTENSIONS]
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(convert_file, source, delivery_path(source, profile, output_dir), profile): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(f"Converted {source.name} ({len(results)}/{len(sources)})")
+            except Exception as e:
+                if progress_callback:
+                    progress_callback(f"Error: {source.name}: {str(e)}")
+    return results
+
+
+def main():
+    """Bulk conversion command for an output directory"""
+    parser = argparse.ArgumentParser(description="Convert audio files to a delivery profile")
+    parser.add_argument("directory", nargs="?", default=str(config.DEFAULT_OUTPUT_DIR),
+                        help="Directory containing audio files (default: outputs/)")
+    parser.add_argument("--profile", required=True, choices=sorted(config.DELIVERY_PROFILES),
+                        help="Delivery profile")
+    parser.add_argument("--output-dir", help="Output directory (default: <directory>/<profile>)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    output_dir = Path(args.output_dir) if args.output_dir else directory / args.profile
+
+    start = time.perf_counter()
+    results = convert_directory(directory, config.DELIVERY_PROFILES[args.profile], output_dir,
+                                args.workers, progress_callback=print)
+    elapsed = time.perf_counter() - start
+
+    audio_seconds = sum(r["audio_seconds"] for r in results)
+    print(f"\nConverted {len(results)} files ({audio_seconds / 60:.1f} min of audio) in "
+          f"{elapsed:.1f}s ({audio_seconds / max(elapsed, 1e-9):.0f}x realtime)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Compressed output encoding (FLAC, Ogg Opus, MP3) in a process pool
+
+Usage:
+    python encoders.py outputs --format flac
+"""
+import argparse
+import os
+import threading
+import time
+import wave
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import soundfile as sf
+
+import config
+from utils import format_file_size
+
+
+# File extension -> (libsndfile container, libsndfile subtype)
+SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+    "ogg": ("OGG", "VORBIS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+
+# Sample rates the Opus codec can encode
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def check_format(fmt: str, rate: int, sample_format: str = "pcm16"):
+    """
+    Check that audio at a rate and sample format can be written as a format
+
+    Args:
+        fmt: File extension without the dot (e.g. "opus")
+        rate: Sample rate
+        sample_format: "pcm16" or "mulaw"
+
+    Raises:
+        ValueError: If the format cannot hold the audio
+    """
+    fmt = fmt.lower()
+    if fmt != "wav" and fmt not in SOUNDFILE_FORMATS:
+        raise ValueError(f"Unsupported output format: .{fmt}")
+    if sample_format == "mulaw" and fmt != "wav":
+        raise ValueError("mu-law output is only supported in WAV files")
+    if fmt == "opus" and rate not in OPUS_RATES:
+        raise ValueError(
+            f"Opus does not support {rate} Hz audio "
+            f"(supported: {', '.join(str(r) for r in OPUS_RATES)} Hz)"
+        )
+
+
+def encode_pcm(
+    pcm_data: bytes,
+    output_path: Path,
+    rate: int = config.AUDIO_SAMPLE_RATE,
+    channels: int = config.AUDIO_CHANNELS,
+    sample_format: str = "pcm16"
+) -> dict:
+    """
+    Encode 16-bit PCM data to the format given by the output file extension
+
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Args:
+        pcm_data: 16-bit little-endian PCM audio data
+        output_path: Output file path (.wav, .flac, .opus, .ogg or .mp3)
+        rate: Sample rate
+        channels: Number of audio channels
+        sample_format: "pcm16", or "mulaw" for WAV files only
+
+    Returns:
+        Encoding stats (sizes in bytes, durations in seconds)
+    """
+    output_path = Path(output_path)
+    fmt = output_path.suffix.lstrip(".").lower()
+    check_format(fmt, rate, sample_format)
+    start = time.perf_counter()
+
+    try:
+        if sample_format == "mulaw":
+            samples = np.frombuffer(pcm_data, dtype="<i2").reshape(-1, channels)
+            sf.write(str(output_path), samples, rate, format="WAV", subtype="ULAW")
+        elif fmt == "wav":
+            with wave.open(str(output_path), "wb") as wf:
+                wf.setnchannels(channels)
+                wf.setsampwidth(config.AUDIO_SAMPLE_WIDTH)
+                wf.setframerate(rate)
+                wf.writeframes(pcm_data)
+        else:
+            container, subtype = SOUNDFILE_FORMATS[fmt]
+            samples = np.frombuffer(pcm_data, dtype="<i2").reshape(-1, channels)
+            sf.write(str(output_path), samples, rate, format=container, subtype=subtype)
+    except Exception:
+        # Don't leave a partial or empty file that looks like a finished render
+        output_path.unlink(missing_ok=True)
+        raise
+
+    return {
+        "output_path": str(output_path),
+        "input_bytes": len(pcm_data),
+        "output_bytes": output_path.stat().st_size,
+        "audio_seconds": len(pcm_data) / (rate * channels * config.AUDIO_SAMPLE_WIDTH),
+        "encode_seconds": time.perf_counter() - start,
+    }
+
+
+def transcode_file(
+    source_path: Path,
+    fmt: str,
+    output_dir: Optional[Path] = None,
+    remove_source: bool = False
+) -> dict:
+    """
+    Transcode an existing 16-bit WAV file to another format
+
+    Args:
+        source_path: Source WAV file
+        fmt: Target file extension (e.g. "flac")
+        output_dir: Output directory (default: next to the source)
+        remove_source: Delete the WAV file after a successful encode
+
+    Returns:
+        Encoding stats, with input_bytes set to the source file size
+    """
+    source_path = Path(source_path)
+    with wave.open(str(source_path), "rb") as wf:
+        if wf.getsampwidth() != config.AUDIO_SAMPLE_WIDTH:
+            raise ValueError(f"{source_path.name}: only 16-bit WAV files are supported")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        pcm_data = wf.readframes(wf.getnframes())
+
+    output_path = Path(output_dir or source_path.parent) / f"{source_path.stem}.{fmt}"
+    stats = encode_pcm(pcm_data, output_path, rate=rate, channels=channels)
+    stats["input_bytes"] = source_path.stat().st_size
+
+    if remove_source:
+        source_path.unlink()
+
+    return stats
+
+
+class EncoderPool:
+    """Process pool for CPU-bound audio encoding with running stats"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize the encoder pool
+
+        Args:
+            max_workers: Number of worker processes (default: one per CPU core)
+        """
+        self.max_workers = max_workers or config.ENCODER_WORKERS or os.cpu_count()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "files": 0,
+            "input_bytes": 0,
+            "output_bytes": 0,
+            "audio_seconds": 0.0,
+            "encode_seconds": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start worker processes on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _record(self, future: Future):
+        """Add a finished encode to the running stats"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        with self._lock:
+            self.stats["files"] += 1
+            for key in ("input_bytes", "output_bytes", "audio_seconds", "encode_seconds"):
+                self.stats[key] += result[key]
+
+    def submit(
+        self,
+        pcm_data: bytes,
+        output_path: Path,
+        rate: int = config.AUDIO_SAMPLE_RATE,
+        channels: int = config.AUDIO_CHANNELS,
+        sample_format: str = "pcm16"
+    ) -> Future:
+        """
+        Queue PCM data for encoding without blocking the caller
+
+        Returns:
+            Future resolving to the encoding stats
+        """
+        future = self._get_executor().submit(
+            encode_pcm, pcm_data, output_path, rate, channels, sample_format
+        )
+        future.add_done_callback(self._record)
+        return future
+
+    def encode(
+        self,
+        pcm_data: bytes,
+        output_path: Path,
+        rate: int = config.AUDIO_SAMPLE_RATE,
+        channels: int = config.AUDIO_CHANNELS,
+        sample_format: str = "pcm16"
+    ) -> dict:
+        """Encode PCM data in a worker process and wait for the result"""
+        return self.submit(pcm_data, output_path, rate, channels, sample_format).result()
+
+    def transcode_directory(
+        self,
+        directory: Path,
+        fmt: str,
+        output_dir: Optional[Path] = None,
+        remove_source: bool = False,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> list[dict]:
+        """
+        Transcode every WAV file in a directory across all worker processes
+
+        Args:
+            directory: Directory containing WAV files
+            fmt: Target file extension (e.g. "flac")
+            output_dir: Output directory (default: alongside the sources)
+            remove_source: Delete each WAV file after a successful encode
+            progress_callback: Callback function for progress updates
+
+        Returns:
+            Encoding stats for each successfully transcoded file
+        """
+        if fmt not in SOUNDFILE_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+
+        sources = sorted(Path(directory).glob("*.wav"))
+        executor = self._get_executor()
+        futures = {}
+        for source in sources:
+            future = executor.submit(transcode_file, source, fmt, output_dir, remove_source)
+            future.add_done_callback(self._record)
+            futures[future] = source
+
+        results = []
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(f"Encoded {source.name} ({len(results)}/{len(sources)})")
+            except Exception as e:
+                if progress_callback:
+                    progress_callback(f"Error: {source.name}: {str(e)}")
+
+        return results
+
+    def summary(self) -> str:
+        """Human-readable compression ratio and throughput"""
+        with self._lock:
+            stats = dict(self.stats)
+        if not stats["files"] or not stats["output_bytes"]:
+            return "No files encoded"
+
+        ratio = stats["input_bytes"] / stats["output_bytes"]
+        cpu_seconds = max(stats["encode_seconds"], 1e-9)
+        realtime = stats["audio_seconds"] / cpu_seconds
+        mb_per_second = stats["input_bytes"] / cpu_seconds / (1024 * 1024)
+        return (
+            f"{stats['files']} files, {format_file_size(stats['input_bytes'])} -> "
+            f"{format_file_size(stats['output_bytes'])} ({ratio:.1f}x smaller), "
+            f"{realtime:.0f}x realtime ({mb_per_second:.1f} MB/s per worker)"
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Stop worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> EncoderPool:
+    """Shared encoder pool for the application"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = EncoderPool()
+        return _default_pool
+
+
+def main():
+    """Bulk transcode command for an existing output directory"""
+    parser = argparse.ArgumentParser(description="Transcode WAV outputs to a compressed format")
+    parser.add_argument("directory", nargs="?", default=str(config.DEFAULT_OUTPUT_DIR),
+                        help="Directory containing WAV files (default: outputs/)")
+    parser.add_argument("--format", default="flac", choices=sorted(SOUNDFILE_FORMATS),
+                        help="Target format (default: flac)")
+    parser.add_argument("--output-dir", help="Write encoded files here instead of alongside")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--delete-source", action="store_true",
+                        help="Delete each WAV file after it is encoded")
+    args = parser.parse_args()
+
+    pool = EncoderPool(max_workers=args.workers)
+    start = time.perf_counter()
+    try:
+        results = pool.transcode_directory(
+            Path(args.directory),
+            args.format,
+            output_dir=Path(args.output_dir) if args.output_dir else None,
+            remove_source=args.delete_source,
+            progress_callback=print
+        )
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    audio_seconds = sum(r["audio_seconds"] for r in results)
+    print(f"\n{pool.summary()}")
+    print(f"Wall time: {elapsed:.1f}s ({audio_seconds / max(elapsed, 1e-9):.0f}x realtime "
+          f"across {pool.max_workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Indexed generation history backed by SQLite
+
+Every generation is recorded with the job that produced it, so it can be
+searched, filtered and re-generated later. Text search uses SQLite FTS5
+when it is available and falls back to LIKE otherwise.
+"""
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import config
+
+
+class HistoryIndex:
+    """SQLite store of past generations"""
+
+    COLUMNS = ("id", "timestamp", "voice", "model", "text", "output_path", "job")
+
+    def __init__(self, index_file: Optional[Path] = None):
+        """
+        Open (or create) the history index
+
+        Args:
+            index_file: SQLite file path (default: config.HISTORY_INDEX_FILE)
+        """
+        self.index_file = Path(index_file or config.HISTORY_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS generations (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                voice TEXT,
+                model TEXT,
+                text TEXT,
+                output_path TEXT,
+                job TEXT
+            );
+            CREATE INDEX IF NOT EXISTS generations_timestamp ON generations (timestamp);
+            CREATE INDEX IF NOT EXISTS generations_voice ON generations (voice, id);
+            CREATE INDEX IF NOT EXISTS generations_model ON generations (model, id);
+            CREATE INDEX IF NOT EXISTS generations_output ON generations (output_path, id);
+        """)
+
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5("
+                "text, content='generations', content_rowid='id')"
+            )
+            self.full_text_search = True
+        except sqlite3.OperationalError:
+            self.full_text_search = False
+        self._conn.commit()
+
+    def add(self, text: str, voice: str, output_path: Path, model: Optional[str] = None,
+            job: Optional[dict] = None, timestamp: Optional[str] = None) -> int:
+        """
+        Record a generation
+
+        Args:
+            text: Generated text (or full prompt)
+            voice: Voice used
+            output_path: Output file path
+            model: Model used (optional)
+            job: Settings needed to re-generate it (see jobs.py, optional)
+            timestamp: "YYYY-MM-DD HH:MM:SS" (default: now)
+
+        Returns:
+            Row id of the new entry
+        """
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO generations (timestamp, voice, model, text, output_path, job) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, voice, model, text, str(output_path),
+                 json.dumps(job) if job is not None else None)
+            )
+            if self.full_text_search:
+                self._conn.execute(
+                    "INSERT INTO generations_fts (rowid, text) VALUES (?, ?)",
+                    (cursor.lastrowid, text)
+                )
+        return cursor.lastrowid
+
+    def count(self, **filters) -> int:
+        """Number of entries matching the filters (see search)"""
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM generations{where}", params
+            ).fetchone()[0]
+
+    def search(self, offset: int = 0, limit: int = 100, **filters) -> list[dict]:
+        """
+        Page through entries, newest first
+
+        Args:
+            offset: Number of entries to skip
+            limit: Maximum number of entries
+            query: Text to search for (optional)
+            voice: Exact voice name (optional)
+            model: Exact model name (optional)
+            date_from: First day, "YYYY-MM-DD" (optional)
+            date_to: Last day, "YYYY-MM-DD" (optional)
+
+        Returns:
+            List of entry dicts (job decoded to a dict, or None)
+        """
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM generations{where} "
+                f"ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+
+        entries = []
+        for row in rows:
+            entry = dict(zip(self.COLUMNS, row))
+            entry["job"] = json.loads(entry["job"]) if entry["job"] else None
+            entries.append(entry)
+        return entries
+
+    def _where(self, query: str = "", voice: str = "", model: str = "",
+               date_from: str = "", date_to: str = "") -> tuple[str, list]:
+        """Build the WHERE clause for a set of filters"""
+        clauses = []
+        params = []
+
+        if query:
+            if self.full_text_search:
+                clauses.append("id IN (SELECT rowid FROM generations_fts WHERE generations_fts MATCH ?)")
+                params.append(self._fts_query(query))
+            else:
+                clauses.append("text LIKE ?")
+                params.append(f"%{query}%")
+        if voice:
+            clauses.append("voice = ?")
+            params.append(voice)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if date_from:
+            clauses.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("timestamp < ?")
+            params.append(f"{date_to}~")  # "~" sorts after any time of that day
+
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _fts_query(self, query: str) -> str:
+        """Turn free text into an FTS5 query matching all words as prefixes"""
+        words = re.findall(r"\w+", query)
+        return " ".join(f'"{word}"*' for word in words) or '""'
+
+    def spoken_text_for(self, output_path: Path) -> Optional[str]:
+        """
+        Spoken text of the latest generation written to a file
+
+        Only entries with job settings are used: the text of entries
+        imported from the legacy log is truncated.
+
+        Returns:
+            The transcript (or plain text), or None if unknown
+        """
+        output_path = Path(output_path)
+        candidates = {str(output_path), str(output_path.resolve())}
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT job FROM generations WHERE output_path IN ({', '.join('?' * len(candidates))}) "
+                "AND job IS NOT NULL ORDER BY id DESC LIMIT 1",
+                list(candidates)
+            ).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        return job.get("transcript") or job.get("text")
+
+    def import_legacy_history(self, history_file: Path) -> int:
+        """
+        Import entries from the flat generation_history.txt log
+
+        Args:
+            history_file: Legacy history log
+
+        Returns:
+            Number of entries imported
+        """
+        if not Path(history_file).exists():
+            return 0
+
+        with open(history_file, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        imported = 0
+        for block in content.split("=" * 60):
+            fields = dict(re.findall(r"^(Timestamp|Voice|Output|Text): (.*)$", block, re.MULTILINE))
+            if "Timestamp" in fields and "Output" in fields:
+                self.add(fields.get("Text", ""), fields.get("Voice", ""), Path(fields["Output"]),
+                         timestamp=fields["Timestamp"])
+                imported += 1
+        return imported
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index() -> HistoryIndex:
+    """
+    Shared history index for the application
+
+    On first use the legacy generation_history.txt log is imported into
+    an empty index.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = HistoryIndex()
+            if _default_index.count() == 0:
+                _default_index.import_legacy_history(config.LEGACY_HISTORY_FILE)
+        return _default_index
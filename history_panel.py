@@ -0,0 +1,236 @@
+"""
+History browser window for the desktop application
+
+The list is virtualized: only the visible rows exist as widgets, and
+entries are loaded from the history index one page at a time as the
+list scrolls, so it stays responsive with 100k+ entries.
+"""
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from tkinter import messagebox
+from typing import Callable, Optional
+
+import customtkinter as ctk
+
+import config
+from history import HistoryIndex
+
+
+class HistoryPanel(ctk.CTkToplevel):
+    """Searchable list of past generations"""
+
+    VISIBLE_ROWS = 14
+    PAGE_SIZE = 100
+    MAX_CACHED_PAGES = 20
+    SEARCH_DELAY_MS = 300
+
+    ALL_VOICES = "All voices"
+    ALL_MODELS = "All models"
+
+    def __init__(self, master, index: HistoryIndex, on_regenerate: Callable[[dict], None]):
+        """
+        Initialize the history window
+
+        Args:
+            master: Parent window
+            index: History index to browse
+            on_regenerate: Called with an entry dict when "Regenerate" is clicked
+                (only offered for entries with saved job settings)
+        """
+        super().__init__(master)
+
+        self.title("Generation History")
+        self.geometry("950x620")
+        self.transient(master)
+
+        self.index = index
+        self.on_regenerate = on_regenerate
+        self.filters = {}
+        self.total = 0
+        self.top = 0
+        self._pages = OrderedDict()
+        self._search_after_id = None
+
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        """Create the filter bar, the fixed pool of row widgets and the scrollbar"""
+        filter_frame = ctk.CTkFrame(self)
+        filter_frame.pack(fill="x", padx=10, pady=(10, 5))
+
+        self.search_entry = ctk.CTkEntry(filter_frame, placeholder_text="Search text...", width=260)
+        self.search_entry.pack(side="left", padx=5, pady=5)
+        self.search_entry.bind("<KeyRelease>", lambda event: self.schedule_refresh())
+
+        self.voice_filter = ctk.CTkOptionMenu(
+            filter_frame,
+            values=[self.ALL_VOICES] + config.VOICES,
+            width=130,
+            command=lambda choice: self.refresh()
+        )
+        self.voice_filter.pack(side="left", padx=5)
+
+        self.model_filter = ctk.CTkOptionMenu(
+            filter_frame,
+            values=[self.ALL_MODELS] + list(config.MODELS.keys()),
+            width=200,
+            command=lambda choice: self.refresh()
+        )
+        self.model_filter.pack(side="left", padx=5)
+
+        self.date_from = ctk.CTkEntry(filter_frame, placeholder_text="From YYYY-MM-DD", width=130)
+        self.date_from.pack(side="left", padx=5)
+        self.date_from.bind("<KeyRelease>", lambda event: self.schedule_refresh())
+
+        self.date_to = ctk.CTkEntry(filter_frame, placeholder_text="To YYYY-MM-DD", width=130)
+        self.date_to.pack(side="left", padx=5)
+        self.date_to.bind("<KeyRelease>", lambda event: self.schedule_refresh())
+
+        ctk.CTkButton(
+            filter_frame, text="🔄", width=40, command=self.refresh
+        ).pack(side="left", padx=5)
+
+        self.count_label = ctk.CTkLabel(self, text="", anchor="w")
+        self.count_label.pack(fill="x", padx=15)
+
+        # Virtualized list: a fixed pool of rows plus a scrollbar over all entries
+        list_frame = ctk.CTkFrame(self)
+        list_frame.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+
+        self.scrollbar = ctk.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        rows_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        rows_frame.pack(side="left", fill="both", expand=True)
+
+        self.rows = []
+        for _ in range(self.VISIBLE_ROWS):
+            row = ctk.CTkFrame(rows_frame)
+            row.pack(fill="x", pady=1)
+
+            label = ctk.CTkLabel(row, text="", anchor="w", font=("Courier", 11))
+            label.pack(side="left", fill="x", expand=True, padx=5)
+
+            regenerate_btn = ctk.CTkButton(row, text="🔁 Regenerate", width=110)
+            regenerate_btn.pack(side="right", padx=2, pady=2)
+
+            open_btn = ctk.CTkButton(row, text="▶ Open", width=70)
+            open_btn.pack(side="right", padx=2, pady=2)
+
+            self.rows.append((row, label, open_btn, regenerate_btn))
+
+            for widget in (row, label):
+                widget.bind("<MouseWheel>", self.on_mousewheel)
+                widget.bind("<Button-4>", lambda event: self.scroll_to(self.top - 3))
+                widget.bind("<Button-5>", lambda event: self.scroll_to(self.top + 3))
+
+        rows_frame.bind("<MouseWheel>", self.on_mousewheel)
+
+    def schedule_refresh(self):
+        """Refresh shortly after typing stops, instead of on every key"""
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(self.SEARCH_DELAY_MS, self.refresh)
+
+    def refresh(self):
+        """Re-read the filters and reload the list from the top"""
+        self._search_after_id = None
+
+        voice = self.voice_filter.get()
+        model = self.model_filter.get()
+        self.filters = {
+            "query": self.search_entry.get().strip(),
+            "voice": "" if voice == self.ALL_VOICES else voice,
+            "model": config.MODELS.get(model, ""),
+            "date_from": self.date_from.get().strip(),
+            "date_to": self.date_to.get().strip(),
+        }
+
+        self._pages.clear()
+        self.total = self.index.count(**self.filters)
+        self.count_label.configure(text=f"{self.total:,} generations")
+        self.scroll_to(0)
+
+    def on_scrollbar(self, *args):
+        """Handle scrollbar drags ("moveto") and arrow/page clicks ("scroll")"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = self.VISIBLE_ROWS if args[2] == "pages" else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        """Scroll three rows per wheel notch"""
+        self.scroll_to(self.top - 3 * int(event.delta / abs(event.delta or 1)))
+
+    def scroll_to(self, top: int):
+        """Show the entries starting at position top"""
+        self.top = max(0, min(top, self.total - self.VISIBLE_ROWS))
+
+        for offset, (row, label, open_btn, regenerate_btn) in enumerate(self.rows):
+            entry = self.get_entry(self.top + offset)
+            if entry is None:
+                label.configure(text="")
+                open_btn.configure(state="disabled")
+                regenerate_btn.configure(state="disabled")
+                continue
+
+            label.configure(text=self.format_entry(entry))
+            open_btn.configure(state="normal", command=lambda e=entry: self.open_entry(e))
+            # Entries imported from the legacy log only kept a truncated first line of text
+            if entry["job"] is None:
+                regenerate_btn.configure(state="disabled")
+            else:
+                regenerate_btn.configure(state="normal", command=lambda e=entry: self.on_regenerate(e))
+
+        if self.total:
+            self.scrollbar.set(self.top / self.total,
+                               min(1.0, (self.top + self.VISIBLE_ROWS) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def get_entry(self, position: int) -> Optional[dict]:
+        """Entry at a list position, loading its page on first access"""
+        if position >= self.total:
+            return None
+
+        page_number = position // self.PAGE_SIZE
+        page = self._pages.get(page_number)
+        if page is None:
+            page = self.index.search(
+                offset=page_number * self.PAGE_SIZE, limit=self.PAGE_SIZE, **self.filters
+            )
+            self._pages[page_number] = page
+            if len(self._pages) > self.MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+
+        index = position % self.PAGE_SIZE
+        return page[index] if index < len(page) else None
+
+    def format_entry(self, entry: dict) -> str:
+        """One-line summary of an entry"""
+        text = " ".join(entry["text"].split())
+        if len(text) > 60:
+            text = text[:57] + "..."
+        model = "Pro" if "pro" in (entry["model"] or "") else "Flash" if entry["model"] else "-"
+        return f"{entry['timestamp']}  {entry['voice']:<9} {model:<5}  {text}"
+
+    def open_entry(self, entry: dict):
+        """Open an entry's audio file with the system's default player"""
+        path = Path(entry["output_path"])
+        if not path.exists():
+            messagebox.showerror("File Not Found", f"The audio file no longer exists:\n{path}")
+            return
+
+        if sys.platform == "win32":
+            os.startfile(path)
+        elif sys.platform == "darwin":
+            subprocess.Popen(["open", str(path)])
+        else:
+            subprocess.Popen(["xdg-open", str(path)])
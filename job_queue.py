@@ -0,0 +1,232 @@
+"""
+Durable job queue shared by render workers
+
+Workers lease jobs for a limited time and extend the lease with
+heartbeats while rendering. If a worker crashes, its lease runs out and
+the job is handed to another worker. SQLite on a shared volume is the
+default backend; other backends implement the JobQueue interface and
+are registered with register_backend.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class JobQueue:
+    """Interface for job queue backends"""
+
+    def enqueue(self, job: dict, output_name: Optional[str] = None) -> int:
+        """
+        Add a job to the queue
+
+        Args:
+            job: Job dict (see jobs.py)
+            output_name: Output file name without extension (default: chosen by the worker)
+
+        Returns:
+            Job id
+        """
+        raise NotImplementedError
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        """
+        Take the next queued job, or one whose lease has expired
+
+        Returns:
+            Dict with id, job, output_name and attempts, or None if nothing is available
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """
+        Extend a lease
+
+        Called from the worker's heartbeat thread while the render runs, so
+        backends must allow calls from more than one thread.
+
+        Returns:
+            False if the lease was lost (expired and taken by another worker)
+        """
+        raise NotImplementedError
+
+    def complete(self, job_id: int, worker_id: str, output_path: str) -> bool:
+        """Mark a leased job as done; returns False if the lease was lost"""
+        raise NotImplementedError
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Release a leased job for retry, or mark it failed; returns False if the lease was lost"""
+        raise NotImplementedError
+
+    def counts(self) -> dict:
+        """Number of jobs in each state (queued, leased, done, failed)"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release backend resources"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite file, safe to share between processes and machines"""
+
+    def __init__(self, queue_file: Path, max_attempts: int = 3, timeout: float = 30.0):
+        """
+        Open (or create) a queue file
+
+        Args:
+            queue_file: SQLite file path (may be on a shared volume)
+            max_attempts: Leases per job before it is marked failed
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.queue_file = Path(queue_file)
+        self.max_attempts = max_attempts
+        # The connection is shared with the worker's heartbeat thread, so
+        # every use of it holds _lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.queue_file), timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        # Rollback journal rather than WAL, which needs shared memory and
+        # does not work on network filesystems
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                job TEXT NOT NULL,
+                output_name TEXT,
+                state TEXT NOT NULL DEFAULT 'queued',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output_path TEXT,
+                error TEXT,
+                created REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+        """)
+
+    def enqueue(self, job: dict, output_name: Optional[str] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (job, output_name, created) VALUES (?, ?, ?)",
+                (json.dumps(job), output_name, time.time())
+            )
+            return cursor.lastrowid
+
+    def enqueue_many(self, jobs: list[dict]) -> int:
+        """Add many jobs in one transaction; returns the number added"""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO jobs (job, created) VALUES (?, ?)",
+                    [(json.dumps(job), now) for job in jobs]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return len(jobs)
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        with self._lock:
+            now = time.time()
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers
+            # can never select the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases that used up their attempts are given up on
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'failed', error = 'Lease expired too many times', "
+                    "finished = ? WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id, job, output_name, attempts FROM jobs "
+                    "WHERE state = 'queued' OR (state = 'leased' AND lease_expires < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'leased', worker_id = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now + lease_seconds, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            return {"id": row[0], "job": json.loads(row[1]), "output_name": row[2], "attempts": row[3] + 1}
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, output_path: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'done', output_path = ?, error = NULL, finished = ? "
+                "WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (str(output_path), time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET "
+                "state = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "error = ?, lease_expires = NULL, finished = ? "
+                "WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (retry, self.max_attempts, error, time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+            for state, count in self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+                counts[state] = count
+            return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Backend name -> JobQueue class taking the location as its first argument
+QUEUE_BACKENDS = {
+    "sqlite": SQLiteJobQueue,
+}
+
+
+def register_backend(scheme: str, queue_class: type):
+    """Make a JobQueue implementation available as scheme://location"""
+    QUEUE_BACKENDS[scheme] = queue_class
+
+
+def open_queue(url: str) -> JobQueue:
+    """
+    Open a queue from a URL like sqlite:///mnt/shared/queue.db
+
+    A plain file path opens a SQLite queue.
+    """
+    scheme, separator, location = url.partition("://")
+    if not separator:
+        return SQLiteJobQueue(Path(url))
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown queue backend: {scheme}")
+    return QUEUE_BACKENDS[scheme](location)
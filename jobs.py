@@ -0,0 +1,191 @@
+"""
+Render jobs: script files with voice/model settings, rendered by AudioEngine
+
+A job is a plain dict. Script files become jobs as follows:
+- name.txt: the text to speak; settings come from an optional sidecar
+  file name.settings.json
+- name.json: {"text": "...", "voice": "Kore", ...}, or advanced-mode
+  components ("audio_profile", "scene", "directors_notes", "transcript"),
+  optionally taken from a saved style preset ("style": "name" or "name@2")
+"""
+import json
+from pathlib import Path
+from typing import Callable, Optional
+
+import config
+from audio_engine import AudioEngine
+from delivery import check_profile_format
+from styles import apply_style
+from utils import (
+    validate_text, create_prompt_from_components, split_pause_markers,
+    has_pause_markers, create_prompts_with_pauses
+)
+
+
+SIDECAR_SUFFIX = ".settings.json"
+SCRIPT_EXTENSIONS = (".txt", ".json")
+
+JOB_DEFAULTS = {
+    "voice": config.VOICES[2],  # Kore
+    "model": list(config.MODELS.values())[0],
+    "format": "wav",
+    "speakers": None,
+}
+
+
+def sidecar_path(script_path: Path) -> Path:
+    """Settings sidecar for a .txt script (name.txt -> name.settings.json)"""
+    return script_path.with_name(script_path.stem + SIDECAR_SUFFIX)
+
+
+def is_script_file(path: Path) -> bool:
+    """Check whether a path is a script file (and not a settings sidecar)"""
+    return (
+        path.suffix.lower() in SCRIPT_EXTENSIONS
+        and not path.name.lower().endswith(SIDECAR_SUFFIX)
+        and not path.name.startswith(".")
+    )
+
+
+def load_job_file(
+    path: Path,
+    defaults: Optional[dict] = None,
+    delivery_profile: Optional[str] = None
+) -> dict:
+    """
+    Turn a script file into a job
+
+    Args:
+        path: .txt or .json script file
+        defaults: Settings used when neither the file nor a sidecar sets them
+        delivery_profile: Profile the job will be rendered with, to check its format against
+
+    Returns:
+        Job dict with text, voice, model, format and speakers
+    """
+    path = Path(path)
+    job = dict(JOB_DEFAULTS)
+    job.update(defaults or {})
+
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            job.update(json.load(f))
+    else:
+        sidecar = sidecar_path(path)
+        if sidecar.exists():
+            with open(sidecar, "r", encoding="utf-8") as f:
+                job.update(json.load(f))
+        with open(path, "r", encoding="utf-8") as f:
+            job["text"] = f.read().strip()
+
+    return normalize_job(job, delivery_profile)
+
+
+def normalize_job(job: dict, delivery_profile: Optional[str] = None) -> dict:
+    """
+    Validate a job and resolve display names to API names
+
+    Args:
+        job: Job dict
+        delivery_profile: Profile the job will be rendered with, to check its format against
+
+    Raises:
+        ValueError: If the text, voice, model, format or style is invalid, or
+            the format cannot hold the delivery profile's audio
+    """
+    try:
+        job = dict(apply_style(job))
+    except KeyError as e:
+        raise ValueError(e.args[0]) from None
+
+    # Model may be given by display name or API name
+    model = job["model"]
+    job["model"] = config.MODELS.get(model, model)
+    if job["model"] not in config.MODELS.values():
+        raise ValueError(f"Unknown model: {model}")
+
+    if job["voice"] not in config.VOICES:
+        raise ValueError(f"Unknown voice: {job['voice']}")
+    for speaker in job.get("speakers") or []:
+        if speaker.get("voice") not in config.VOICES or not speaker.get("name"):
+            raise ValueError(f"Invalid speaker: {speaker}")
+
+    fmt = str(job["format"]).lower()
+    job["format"] = config.OUTPUT_FORMATS.get(job["format"], fmt)
+    if job["format"] not in config.OUTPUT_FORMATS.values():
+        raise ValueError(f"Unknown format: {job['format']}")
+    if delivery_profile:
+        check_profile_format(delivery_profile, job["format"])
+
+    if job.get("transcript"):
+        job["text"] = create_prompt_from_components(
+            job.get("audio_profile", ""), job.get("scene", ""),
+            job.get("directors_notes", ""), job["transcript"]
+        )
+
+    is_valid, error_msg = validate_text(job.get("text", ""))
+    if not is_valid:
+        raise ValueError(error_msg)
+
+    # Check pause lengths now rather than after the first API call
+    spoken_text = job.get("transcript") or job["text"]
+    if has_pause_markers(spoken_text):
+        split_pause_markers(spoken_text)
+
+    return job
+
+
+def render_job(
+    engine: AudioEngine,
+    job: dict,
+    output_path: Path,
+    progress_callback: Optional[Callable[[str], None]] = None
+) -> Path:
+    """
+    Render a job with the engine, choosing the right generation path
+
+    Args:
+        engine: Audio engine
+        job: Job dict (see load_job_file / normalize_job)
+        output_path: Output file path; its extension selects the format
+        progress_callback: Callback function for progress updates
+
+    Returns:
+        Path to the generated audio file
+    """
+    speakers = job.get("speakers")
+    spoken_text = job.get("transcript") or job["text"]
+
+    if has_pause_markers(spoken_text):
+        if job.get("transcript"):
+            segments = create_prompts_with_pauses(
+                job.get("audio_profile", ""), job.get("scene", ""),
+                job.get("directors_notes", ""), job["transcript"]
+            )
+        else:
+            segments = split_pause_markers(job["text"])
+        return engine.generate_segments(
+            segments,
+            voice=job["voice"],
+            speakers=speakers,
+            model=job["model"],
+            output_path=output_path,
+            progress_callback=progress_callback
+        )
+
+    if speakers:
+        return engine.generate_multi_speaker(
+            text=job["text"],
+            speakers=speakers,
+            model=job["model"],
+            output_path=output_path,
+            progress_callback=progress_callback
+        )
+
+    return engine.generate_single_speaker(
+        text=job["text"],
+        voice=job["voice"],
+        model=job["model"],
+        output_path=output_path,
+        progress_callback=progress_callback
+    )
@@ -0,0 +1,455 @@
+"""
+Style presets for advanced mode, applied to many transcripts
+
+A preset is a saved Audio Profile, Scene and Director's Notes. Saving a
+preset under an existing name with different text adds a new version,
+so older renders can still name the exact style they used.
+
+A StyleSession renders many transcripts in one style. Where the API
+accepts it, the shared style prefix is uploaded once as cached content
+and each request only sends its transcript. Otherwise (model without
+caching support, prefix below the minimum cache size, record/replay
+mode) the full prompt is sent with every request, but identical
+transcripts in a batch are still rendered only once.
+
+Usage:
+    python styles.py save narrator --profile "Warm narrator" --scene "Studio" --notes "Calm pace"
+    python styles.py list
+    python styles.py render narrator lines.txt --voice Kore --format flac
+"""
+import argparse
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from google.genai import types
+
+import config
+from analysis import check_output
+from audio_engine import AudioEngine
+from captions import copy_captions
+from cassette import CassetteClient
+from utils import (
+    create_prompt_from_components, split_pause_markers, has_pause_markers,
+    sanitize_filename, format_file_size
+)
+
+
+STYLE_FIELDS = ("audio_profile", "scene", "directors_notes")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (1 token ≈ 4 characters, as in utils.validate_text)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def style_prefix(preset: dict) -> str:
+    """Prompt text shared by every transcript in a style"""
+    return create_prompt_from_components(
+        preset.get("audio_profile", ""), preset.get("scene", ""), preset.get("directors_notes", "")
+    )
+
+
+class StyleStore:
+    """Versioned style presets in a JSON file"""
+
+    def __init__(self, styles_file: Path = config.STYLES_FILE):
+        """
+        Open (or create) a style store
+
+        Args:
+            styles_file: JSON file holding every version of every preset
+        """
+        self.styles_file = Path(styles_file)
+        self._lock = threading.Lock()
+        self._styles = {}
+        if self.styles_file.exists():
+            with open(self.styles_file, "r", encoding="utf-8") as f:
+                self._styles = json.load(f)
+
+    def save(self, name: str, audio_profile: str = "", scene: str = "",
+             directors_notes: str = "") -> dict:
+        """
+        Save a preset, adding a new version if the text changed
+
+        Returns:
+            The saved (or unchanged latest) preset version
+
+        Raises:
+            ValueError: If the name is empty or contains "@" (reserved for name@version)
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("Style name cannot be empty")
+        if "@" in name:
+            raise ValueError('Style names cannot contain "@" (it separates name@version)')
+        if not (audio_profile or scene or directors_notes):
+            raise ValueError("A style needs an audio profile, scene or director's notes")
+
+        fields = {"audio_profile": audio_profile, "scene": scene, "directors_notes": directors_notes}
+        with self._lock:
+            versions = self._styles.setdefault(name, [])
+            if versions and all(versions[-1][key] == value for key, value in fields.items()):
+                return dict(versions[-1])
+
+            preset = {
+                "name": name,
+                "version": len(versions) + 1,
+                **fields,
+                "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            versions.append(preset)
+            self._write()
+            return dict(preset)
+
+    def get(self, name: str, version: Optional[int] = None) -> dict:
+        """
+        Look up a preset
+
+        Args:
+            name: Preset name, optionally "name@version"
+            version: Version number (default: the version in the name, else the latest)
+
+        Raises:
+            KeyError: If the preset or version does not exist
+        """
+        with self._lock:
+            # Names saved before "@" was rejected are matched exactly first
+            if version is None and "@" in name and name not in self._styles:
+                name, _, number = name.rpartition("@")
+                if not number.isdigit():
+                    raise KeyError(f"Invalid style version: {number}")
+                version = int(number)
+
+            versions = self._styles.get(name)
+            if not versions:
+                raise KeyError(f"Unknown style: {name}")
+            if version is None:
+                return dict(versions[-1])
+            if not 1 <= version <= len(versions):
+                raise KeyError(f"Style {name} has no version {version}")
+            return dict(versions[version - 1])
+
+    def names(self) -> list[str]:
+        """Preset names in alphabetical order"""
+        with self._lock:
+            return sorted(self._styles)
+
+    def versions(self, name: str) -> list[dict]:
+        """Every version of a preset, oldest first"""
+        with self._lock:
+            return [dict(preset) for preset in self._styles.get(name, [])]
+
+    def _write(self):
+        """Write the store atomically (caller holds the lock)"""
+        temp_file = self.styles_file.with_suffix(".tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self._styles, f, indent=2, ensure_ascii=False)
+        temp_file.replace(self.styles_file)
+
+
+def apply_style(job: dict, store: Optional[StyleStore] = None) -> dict:
+    """
+    Fill a job's advanced-mode components from its "style" preset
+
+    Components set explicitly in the job win over the preset. The resolved
+    version is written back, so the job records the exact style used.
+    """
+    if not job.get("style"):
+        return job
+
+    preset = (store or StyleStore()).get(str(job["style"]))
+    job = dict(job)
+    for field in STYLE_FIELDS:
+        if not job.get(field):
+            job[field] = preset[field]
+    job["style"] = f"{preset['name']}@{preset['version']}"
+    return job
+
+
+class StyleSession:
+    """Renders many transcripts in one style, sharing the style prefix"""
+
+    TRANSCRIPT_HEADER = "#### TRANSCRIPT\n"
+
+    def __init__(
+        self,
+        engine: AudioEngine,
+        preset: dict,
+        model: str = "gemini-2.5-flash-preview-tts",
+        use_cache: bool = True,
+        ttl_seconds: int = config.STYLE_CACHE_TTL,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the session (call close() when done, or use it as a context manager)
+
+        Args:
+            engine: Audio engine
+            preset: Style preset (see StyleStore)
+            model: Model to use for every transcript
+            use_cache: Try to upload the style prefix as cached content
+            ttl_seconds: Lifetime of the cached content
+            progress_callback: Callback function for progress updates
+        """
+        self.engine = engine
+        self.preset = preset
+        self.model = model
+        self.progress_callback = progress_callback
+        self.prefix = style_prefix(preset)
+        self.cache_name = None
+        self.cache_error = None
+        self._rendered = {}
+        self.stats = {
+            "transcripts": 0,
+            "requests": 0,
+            "deduplicated": 0,
+            "prefix_tokens": estimate_tokens(self.prefix),
+            "tokens_sent": 0,
+            "tokens_without_sharing": 0,
+        }
+
+        if use_cache:
+            self._create_cache(ttl_seconds)
+
+    def _create_cache(self, ttl_seconds: int):
+        """Upload the style prefix as cached content, or note why it is not possible"""
+        if isinstance(self.engine.client, CassetteClient):
+            # Cache names differ per run, so cassettes always use full prompts
+            self.cache_error = "not used in record/replay mode"
+            return
+        try:
+            cache = self.engine.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    contents=[self.prefix],
+                    ttl=f"{int(ttl_seconds)}s",
+                    display_name=f"style-{self.preset['name']}-v{self.preset['version']}"[:128],
+                )
+            )
+            self.cache_name = cache.name
+            self.stats["tokens_sent"] += self.stats["prefix_tokens"]
+            self._report(f"Style prefix cached ({self.stats['prefix_tokens']} tokens)")
+        except Exception as e:
+            self.cache_error = str(e)
+            self._report(f"Cached content unavailable, sending full prompts: {str(e)}")
+
+    def prompt(self, transcript: str) -> str:
+        """Request text for a transcript (or one piece of it between pauses)"""
+        if self.cache_name:
+            return f"{self.TRANSCRIPT_HEADER}{transcript}"
+        return create_prompt_from_components(
+            self.preset["audio_profile"], self.preset["scene"],
+            self.preset["directors_notes"], transcript
+        )
+
+    def render(
+        self,
+        transcript: str,
+        output_path: Path,
+        voice: str = config.VOICES[2],
+        speakers: Optional[list[dict]] = None,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> Path:
+        """
+        Render one transcript in the session's style
+
+        A transcript already rendered in this session with the same voices
+        is copied from the earlier output (with its caption files) instead
+        of being requested again.
+
+        Args:
+            transcript: The text to speak, with optional pause markers
+            output_path: Output file path; its extension selects the format
+            voice: Voice name for single-speaker audio
+            speakers: Speaker configs for multi-speaker audio (overrides voice)
+            progress_callback: Callback function for progress updates
+
+        Returns:
+            Path to the generated audio file
+        """
+        output_path = Path(output_path)
+        pieces = [
+            piece if isinstance(piece, float) else self.prompt(piece)
+            for piece in split_pause_markers(transcript)
+        ] if has_pause_markers(transcript) else [self.prompt(transcript)]
+        requests = [piece for piece in pieces if isinstance(piece, str)]
+
+        self.stats["transcripts"] += 1
+        # Without sharing, every request would carry the whole prefix
+        request_tokens = sum(estimate_tokens(piece) for piece in requests)
+        shared_tokens = self.stats["prefix_tokens"] * len(requests) if self.cache_name else 0
+        self.stats["tokens_without_sharing"] += request_tokens + shared_tokens
+
+        key = (transcript, voice, json.dumps(speakers, sort_keys=True), output_path.suffix.lower())
+        earlier = self._rendered.get(key)
+        if earlier is not None and earlier.exists():
+            shutil.copyfile(earlier, output_path)
+            copy_captions(earlier, output_path)
+            self.stats["deduplicated"] += 1
+            if progress_callback:
+                progress_callback(f"Same transcript as {earlier.name}, copied")
+            return output_path
+
+        if len(pieces) > 1:
+            self.engine.generate_segments(
+                pieces, voice=voice, speakers=speakers, model=self.model,
+                output_path=output_path, progress_callback=progress_callback,
+                cached_content=self.cache_name
+            )
+        elif speakers:
+            self.engine.generate_multi_speaker(
+                pieces[0], speakers, model=self.model, output_path=output_path,
+                progress_callback=progress_callback, cached_content=self.cache_name
+            )
+        else:
+            self.engine.generate_single_speaker(
+                pieces[0], voice, model=self.model, output_path=output_path,
+                progress_callback=progress_callback, cached_content=self.cache_name
+            )
+
+        self.stats["requests"] += len(requests)
+        self.stats["tokens_sent"] += request_tokens
+        self._rendered[key] = output_path
+        return output_path
+
+    def summary(self) -> str:
+        """Human-readable token savings for the batch"""
+        stats = self.stats
+        saved = stats["tokens_without_sharing"] - stats["tokens_sent"]
+        percent = 100 * saved / max(stats["tokens_without_sharing"], 1)
+        mode = "cached content" if self.cache_name else f"local ({self.cache_error or 'cache disabled'})"
+        return (
+            f"{stats['transcripts']} transcripts, {stats['requests']} requests, "
+            f"{stats['deduplicated']} duplicates skipped; ~{stats['tokens_sent']:,} prompt tokens sent "
+            f"instead of ~{stats['tokens_without_sharing']:,} ({saved:,} saved, {percent:.0f}%) "
+            f"using {mode}"
+        )
+
+    def close(self):
+        """Delete the cached content"""
+        if self.cache_name:
+            try:
+                self.engine.client.caches.delete(name=self.cache_name)
+            except Exception as e:
+                self._report(f"Could not delete cached content {self.cache_name}: {str(e)}")
+            self.cache_name = None
+
+    def _report(self, message: str):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def render_batch(
+    engine: AudioEngine,
+    preset: dict,
+    transcripts: list[str],
+    output_dir: Path,
+    voice: str = config.VOICES[2],
+    speakers: Optional[list[dict]] = None,
+    model: str = "gemini-2.5-flash-preview-tts",
+    fmt: str = "wav",
+    use_cache: bool = True,
+    progress_callback: Optional[Callable[[str], None]] = None
+) -> tuple[list[Path], dict]:
+    """
+    Render many transcripts in one style
+
+    Args:
+        engine: Audio engine
+        preset: Style preset (see StyleStore)
+        transcripts: Texts to speak
+        output_dir: Output directory
+        voice: Voice name for single-speaker audio
+        speakers: Speaker configs for multi-speaker audio (overrides voice)
+        model: Model to use
+        fmt: Output file extension (e.g. "flac")
+        use_cache: Try to upload the style prefix as cached content
+        progress_callback: Callback function for progress updates
+
+    Returns:
+        Tuple of (output paths, session stats)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = []
+
+    with StyleSession(engine, preset, model, use_cache, progress_callback=progress_callback) as session:
+        for number, transcript in enumerate(transcripts, 1):
+            output_path = output_dir / f"{number:04d}_{sanitize_filename(transcript[:100])}.{fmt}"
+            try:
+                outputs.append(session.render(transcript, output_path, voice, speakers))
+                qa_flags = check_output(output_path, transcript)
+                if progress_callback:
+                    qa_note = f" (QA warnings: {', '.join(qa_flags)})" if qa_flags else ""
+                    progress_callback(f"Rendered {number}/{len(transcripts)}: {output_path.name}{qa_note}")
+            except Exception as e:
+                if progress_callback:
+                    progress_callback(f"Error: transcript {number}: {str(e)}")
+        if progress_callback:
+            progress_callback(session.summary())
+        return outputs, dict(session.stats)
+
+
+def main():
+    """Style preset command line"""
+    parser = argparse.ArgumentParser(description="Advanced-mode style presets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    save_parser = subparsers.add_parser("save", help="Save a preset (adds a version if changed)")
+    save_parser.add_argument("name")
+    save_parser.add_argument("--profile", default="", help="Audio profile")
+    save_parser.add_argument("--scene", default="", help="Scene")
+    save_parser.add_argument("--notes", default="", help="Director's notes")
+
+    subparsers.add_parser("list", help="List presets and their versions")
+
+    render_parser = subparsers.add_parser("render", help="Render one transcript per line of a file")
+    render_parser.add_argument("style", help="Preset name, optionally name@version")
+    render_parser.add_argument("transcripts", help="Text file with one transcript per line")
+    render_parser.add_argument("--output-dir", default=str(config.DEFAULT_OUTPUT_DIR))
+    render_parser.add_argument("--voice", default=config.VOICES[2], choices=config.VOICES)
+    render_parser.add_argument("--model", default=list(config.MODELS.values())[0],
+                               choices=list(config.MODELS.values()))
+    render_parser.add_argument("--format", default="wav", choices=list(config.OUTPUT_FORMATS.values()))
+    render_parser.add_argument("--no-cache", action="store_true",
+                               help="Always send full prompts instead of cached content")
+
+    args = parser.parse_args()
+    store = StyleStore()
+
+    if args.command == "save":
+        preset = store.save(args.name, args.profile, args.scene, args.notes)
+        print(f"Saved {preset['name']} version {preset['version']}")
+
+    elif args.command == "list":
+        for name in store.names():
+            versions = store.versions(name)
+            prefix = style_prefix(versions[-1])
+            print(f"{name}: {len(versions)} version(s), latest {versions[-1]['created']}, "
+                  f"~{estimate_tokens(prefix)} tokens ({format_file_size(len(prefix.encode()))})")
+
+    elif args.command == "render":
+        with open(args.transcripts, "r", encoding="utf-8") as f:
+            transcripts = [line.strip() for line in f if line.strip()]
+        engine = AudioEngine(config.API_KEY)
+        engine.prewarm()
+        render_batch(
+            engine, store.get(args.style), transcripts, Path(args.output_dir),
+            voice=args.voice, model=args.model, fmt=args.format,
+            use_cache=not args.no_cache, progress_callback=print
+        )
+        print(f"Latency: {engine.latency_summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,21 @@ Utility functions for the audio generator
 import re
 from datetime import datetime
 from pathlib import Path
+from typing import Union
+
+from history import get_default_index
+
+
+# Inline pause markup: [pause], [pause 1.5s], [pause 500ms], [break], [break 2s]
+PAUSE_MARKER = re.compile(
+    r"\[\s*(pause|break)(?:\s+(\d+(?:\.\d+)?)\s*(ms|s)?)?\s*\]",
+    re.IGNORECASE
+)
+
+# Longest single pause, and longest total silence in one text, in seconds
+# (pauses are rendered as zero PCM in memory, so they must stay bounded)
+MAX_PAUSE_SECONDS = 60.0
+MAX_TOTAL_PAUSE_SECONDS = 600.0
 
 
 def sanitize_filename(text: str, max_length: int = 50) -> str:
@@ -123,21 +138,113 @@ def create_prompt_from_components(audio_profile: str = "", scene: str = "",
     return "\n\n".join(parts) if parts else transcript
 
 
-def save_history(text: str, voice: str, output_path: Path, history_file: Path = None):
+def split_pause_markers(text: str, pause_seconds: float = 1.0,
+                        break_seconds: float = 0.5) -> list[Union[str, float]]:
     """
-    Save generation history to a log file
+    Split text at inline pause markers
+    
+    Markers look like [pause 1.5s], [pause 500ms], [pause] or [break].
+    Consecutive pauses are merged and blank pieces are dropped.
+    
+    Args:
+        text: Input text with optional pause markers
+        pause_seconds: Length of a bare [pause] (default: 1.0)
+        break_seconds: Length of a bare [break] (default: 0.5)
+    
+    Returns:
+        Text pieces (str) and pause lengths in seconds (float), in order
+    
+    Raises:
+        ValueError: If a pause is longer than MAX_PAUSE_SECONDS, or all
+            pauses together are longer than MAX_TOTAL_PAUSE_SECONDS
+    """
+    segments = []
+    position = 0
+    
+    for match in PAUSE_MARKER.finditer(text):
+        piece = text[position:match.start()].strip()
+        if piece:
+            segments.append(piece)
+        position = match.end()
+        
+        kind, amount, unit = match.groups()
+        if amount is None:
+            seconds = pause_seconds if kind.lower() == "pause" else break_seconds
+        else:
+            seconds = float(amount) / 1000 if (unit or "").lower() == "ms" else float(amount)
+        
+        if segments and isinstance(segments[-1], float):
+            segments[-1] += seconds
+        else:
+            segments.append(seconds)
+    
+    piece = text[position:].strip()
+    if piece:
+        segments.append(piece)
+    
+    pauses = [segment for segment in segments if isinstance(segment, float)]
+    if pauses and max(pauses) > MAX_PAUSE_SECONDS:
+        raise ValueError(
+            f"Pause of {max(pauses):g}s is too long (max {MAX_PAUSE_SECONDS:g}s per pause)"
+        )
+    if sum(pauses) > MAX_TOTAL_PAUSE_SECONDS:
+        raise ValueError(
+            f"Pauses add up to {sum(pauses):g}s (max {MAX_TOTAL_PAUSE_SECONDS:g}s per text)"
+        )
+    
+    return segments
+
+
+def has_pause_markers(text: str) -> bool:
+    """Check whether text contains any inline pause markers"""
+    return PAUSE_MARKER.search(text) is not None
+
+
+def create_prompts_with_pauses(audio_profile: str = "", scene: str = "",
+                               directors_notes: str = "", transcript: str = "") -> list[Union[str, float]]:
+    """
+    Split an advanced-mode transcript at pause markers into full prompts
+    
+    Each spoken piece of the transcript gets the same audio profile, scene
+    and director's notes, so the style is kept across the pauses.
+    
+    Args:
+        audio_profile: Audio profile description
+        scene: Scene description
+        directors_notes: Director's notes
+        transcript: The actual text to speak, with optional pause markers
+    
+    Returns:
+        Prompts (str) and pause lengths in seconds (float), in order
+    """
+    return [
+        create_prompt_from_components(audio_profile, scene, directors_notes, segment)
+        if isinstance(segment, str) else segment
+        for segment in split_pause_markers(transcript)
+    ]
+
+
+def save_history(text: str, voice: str, output_path: Path, history_file: Path = None,
+                 model: str = None, job: dict = None):
+    """
+    Save generation history to a log file and the history index
     
     Args:
         text: Generated text
         voice: Voice used
         output_path: Output file path
         history_file: History file path (optional)
+        model: Model used (optional)
+        job: Settings needed to re-generate the audio (optional, see jobs.py)
     """
     if history_file is None:
         history_file = Path(__file__).parent / "generation_history.txt"
     
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
+    # Index first, so a fresh index imports the log without this entry
+    get_default_index().add(text, voice, output_path, model=model, job=job, timestamp=timestamp)
+    
     with open(history_file, "a", encoding="utf-8") as f:
         f.write(f"\n{'='*60}\n")
         f.write(f"Timestamp: {timestamp}\n")
@@ -0,0 +1,411 @@
+"""
+Watch-folder daemon that renders dropped scripts automatically
+
+Usage:
+    python watcher.py scripts/ --workers 2
+
+Drop name.txt (with an optional name.settings.json sidecar) or name.json
+into the input folder. Each script is rendered once it has stopped
+changing, then moved with its audio into done/, or into failed/ with an
+error note.
+"""
+import argparse
+import glob
+import itertools
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import config
+from analysis import check_output
+from audio_engine import AudioEngine
+from budget import MemoryBudget
+from captions import CAPTION_FORMATS, caption_path, copy_captions, parse_formats
+from delivery import check_profile_format
+from jobs import is_script_file, load_job_file, render_job, sidecar_path
+from utils import save_history
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional: fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards native filesystem events (inotify etc.) to the watcher"""
+
+    def __init__(self, watcher: "FolderWatcher"):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._watcher.notify(Path(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._watcher.notify(Path(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._watcher.notify(Path(event.dest_path))
+
+
+class FolderWatcher:
+    """Watches an input folder and renders scripts through a bounded worker pool"""
+
+    # Seconds between full directory rescans, as a safety net for missed events
+    FULL_RESCAN_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        engine: AudioEngine,
+        input_dir: Path,
+        max_workers: int = 2,
+        settle_seconds: float = 2.0,
+        poll_interval: float = 1.0,
+        use_events: bool = True,
+        defaults: Optional[dict] = None,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the watcher
+
+        Args:
+            engine: Audio engine used to render jobs
+            input_dir: Folder to watch; done/, failed/ and processing/ are created inside it
+            max_workers: Number of scripts rendered concurrently
+            settle_seconds: A file must be unchanged this long before it is rendered
+            poll_interval: Seconds between checks
+            use_events: Use native filesystem events when watchdog is installed
+            defaults: Job settings for scripts that do not set them
+            progress_callback: Callback function for progress updates
+        """
+        self.engine = engine
+        self.input_dir = Path(input_dir)
+        self.done_dir = self.input_dir / "done"
+        self.failed_dir = self.input_dir / "failed"
+        self.processing_dir = self.input_dir / "processing"
+        self.max_workers = max_workers
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.use_events = use_events and Observer is not None
+        self.defaults = defaults or {}
+        self.progress_callback = progress_callback
+
+        for folder in (self.input_dir, self.done_dir, self.failed_dir, self.processing_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._seen = {}            # path -> (mtime_ns, size) at the last scan
+        self._candidates = {}      # path -> (mtime_ns, size, first seen unchanged)
+        self._ready = deque()      # settled scripts waiting for a worker
+        self._in_flight = 0
+        self._reserved = set()     # (folder, name) taken in done/ or failed/ by scripts in progress
+        self._dir_mtime = None
+        self._last_full_scan = None
+        self.stats = {"done": 0, "failed": 0}
+
+    def notify(self, path: Path):
+        """Mark a file as possibly new or changed"""
+        if path.parent == self.input_dir:
+            with self._lock:
+                self._candidates.pop(path, None)
+                self._candidates[path] = (None, None, None)
+
+    def run(self):
+        """Watch and render until stop() is called"""
+        self._recover_interrupted()
+
+        observer = None
+        if self.use_events:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), str(self.input_dir), recursive=False)
+            observer.start()
+            self._report("Watching with native filesystem events")
+        else:
+            self._report("Watching with polling")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while not self._stop.is_set():
+                self._scan(use_listing=observer is None)
+                self._settle()
+                self._dispatch(executor)
+                self._stop.wait(self.poll_interval)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            executor.shutdown(wait=True)
+
+    def stop(self):
+        """Stop watching after the jobs in progress finish"""
+        self._stop.set()
+
+    @property
+    def queued(self) -> int:
+        """Number of settled scripts waiting for a worker"""
+        with self._lock:
+            return len(self._ready)
+
+    def _scan(self, use_listing: bool = True):
+        """
+        Find new or changed files by directory listing
+
+        When polling, the listing is skipped while the folder's own mtime is
+        unchanged (nothing was added, removed or renamed). With native events
+        only the occasional full rescan runs, to catch anything missed.
+
+        Args:
+            use_listing: List the folder whenever its mtime changes
+        """
+        now = time.monotonic()
+        full = (self._last_full_scan is None
+                or now - self._last_full_scan >= self.FULL_RESCAN_INTERVAL)
+        dir_mtime = self.input_dir.stat().st_mtime_ns
+        if not full and (not use_listing or dir_mtime == self._dir_mtime):
+            return
+
+        self._dir_mtime = dir_mtime
+        if full:
+            self._last_full_scan = now
+
+        present = {}
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                present[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            for path, signature in present.items():
+                if self._seen.get(path) != signature and path not in self._candidates:
+                    self._candidates[path] = (None, None, None)
+            self._seen = present
+
+    def _settle(self):
+        """Move candidates that stopped changing to the ready queue"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._candidates.items())
+
+        for path, (mtime, size, since) in candidates:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                with self._lock:
+                    self._candidates.pop(path, None)
+                continue
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            with self._lock:
+                if signature != (mtime, size):
+                    self._candidates[path] = (*signature, now)
+                elif now - since >= self.settle_seconds:
+                    del self._candidates[path]
+                    if not is_script_file(path):
+                        continue
+                    if sidecar_path(path) in self._candidates:
+                        # Wait until the settings sidecar has settled too
+                        self._candidates[path] = (*signature, now)
+                    else:
+                        self._ready.append(path)
+
+    def _dispatch(self, executor: ThreadPoolExecutor):
+        """Submit ready scripts while keeping only a small backlog in the pool"""
+        while True:
+            with self._lock:
+                if not self._ready or self._in_flight >= self.max_workers * 2:
+                    return
+                path = self._ready.popleft()
+                self._in_flight += 1
+            executor.submit(self._process, path)
+
+    def _process(self, path: Path):
+        """Claim, render and file away one script"""
+        try:
+            claimed = self._claim(path)
+            if claimed is None:
+                return
+            script, sidecar = claimed
+
+            # A re-dropped script (or a.txt next to a.json) gets a new name in done/
+            name = self._reserve_name(self.done_dir, script.stem)
+            partial_path = None
+            try:
+                job = load_job_file(script, self.defaults, self.engine.delivery_profile)
+                output_path = self.done_dir / f"{name}.{job['format']}"
+                # Render under a hidden name, so done/ never shows half-written audio
+                partial_path = self.done_dir / f".{name}.partial.{job['format']}"
+                self._report(f"Rendering {script.name}...")
+                render_job(self.engine, job, partial_path)
+                os.replace(partial_path, output_path)
+                copy_captions(partial_path, output_path, move=True)
+                save_history(job["text"], job["voice"], output_path, model=job["model"], job=job)
+                qa_flags = check_output(output_path, job.get("transcript") or job["text"])
+            except Exception as e:
+                if partial_path is not None:
+                    self._remove_partial(partial_path)
+                self._release_name(self.done_dir, name)
+                failed_name = self._reserve_name(self.failed_dir, script.stem)
+                archived = self._file_away(script, sidecar, self.failed_dir, failed_name)
+                error_file = self.failed_dir / f"{archived.name}.error.txt"
+                error_file.write_text(f"{type(e).__name__}: {e}\n", encoding="utf-8")
+                self._release_name(self.failed_dir, failed_name)
+                with self._lock:
+                    self.stats["failed"] += 1
+                self._report(f"Failed {script.name}: {str(e)}")
+                return
+
+            self._file_away(script, sidecar, self.done_dir, name)
+            self._release_name(self.done_dir, name)
+            with self._lock:
+                self.stats["done"] += 1
+            qa_note = f", QA warnings: {', '.join(qa_flags)}" if qa_flags else ""
+            self._report(f"Done {script.name} -> {output_path.name} ({self.queued} queued, "
+                         f"{self.engine.memory_budget.usage()}{qa_note})")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _claim(self, path: Path) -> Optional[tuple[Path, Optional[Path]]]:
+        """Move a script (and its sidecar) into processing/ so it is rendered once"""
+        script = self.processing_dir / path.name
+        try:
+            os.replace(path, script)
+        except FileNotFoundError:
+            return None
+
+        sidecar = None
+        if path.suffix.lower() == ".txt" and sidecar_path(path).exists():
+            sidecar = self.processing_dir / sidecar_path(path).name
+            os.replace(sidecar_path(path), sidecar)
+        return script, sidecar
+
+    def _reserve_name(self, folder: Path, stem: str) -> str:
+        """
+        Name for a script's files in done/ or failed/ that nothing there uses yet
+
+        The script's own name if it is free, otherwise with a timestamp (and
+        a counter if needed). Release it with _release_name once the files
+        are in place.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        names = itertools.chain(
+            [stem, f"{stem}_{timestamp}"],
+            (f"{stem}_{timestamp}_{number}" for number in itertools.count(2))
+        )
+        with self._lock:
+            for name in names:
+                taken = glob.glob(os.path.join(glob.escape(str(folder)), f"{glob.escape(name)}.*"))
+                if (folder, name) not in self._reserved and not taken:
+                    self._reserved.add((folder, name))
+                    return name
+
+    def _release_name(self, folder: Path, name: str):
+        with self._lock:
+            self._reserved.discard((folder, name))
+
+    def _file_away(self, script: Path, sidecar: Optional[Path], folder: Path, name: str) -> Path:
+        """
+        Move a processed script and its sidecar to done/ or failed/
+
+        Returns:
+            Path of the archived script
+        """
+        archived = folder / f"{name}{script.suffix}"
+        if sidecar is not None and sidecar.exists():
+            shutil.move(str(sidecar), str(sidecar_path(archived)))
+        if script.exists():
+            shutil.move(str(script), str(archived))
+        return archived
+
+    def _remove_partial(self, partial_path: Path):
+        """Delete a partial render and its captions"""
+        partial_path.unlink(missing_ok=True)
+        for fmt in CAPTION_FORMATS:
+            caption_path(partial_path, fmt).unlink(missing_ok=True)
+
+    def _recover_interrupted(self):
+        """Put scripts left in processing/ by a previous run back in the queue"""
+        for path in self.processing_dir.iterdir():
+            if path.is_file():
+                os.replace(path, self.input_dir / path.name)
+        # Renders cut off by the previous run
+        for path in self.done_dir.glob(".*.partial.*"):
+            path.unlink()
+
+    def _report(self, message: str):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+
+def main():
+    """Run the watch-folder daemon"""
+    parser = argparse.ArgumentParser(description="Render scripts dropped into a folder")
+    parser.add_argument("input_dir", help="Folder to watch")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent renders (default: 2)")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Seconds a file must be unchanged before rendering (default: 2)")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="Seconds between checks (default: 1)")
+    parser.add_argument("--polling", action="store_true",
+                        help="Always poll, even if watchdog is installed")
+    parser.add_argument("--voice", help="Default voice for scripts without settings")
+    parser.add_argument("--model", help="Default model for scripts without settings")
+    parser.add_argument("--format", help="Default output format (e.g. flac)")
+    parser.add_argument("--profile", default="native", choices=sorted(config.DELIVERY_PROFILES),
+                        help="Delivery profile (default: native)")
+    parser.add_argument("--captions", type=parse_formats, default=config.CAPTIONS,
+                        help="Caption files per render, e.g. srt,vtt,json or none")
+    parser.add_argument("--memory-budget", type=int, default=config.BATCH_MEMORY_BUDGET_MB,
+                        help="MB of audio concurrent renders may hold before new requests wait "
+                             f"(default: {config.BATCH_MEMORY_BUDGET_MB}, 0 for unlimited)")
+    args = parser.parse_args()
+
+    if args.format:
+        try:
+            check_profile_format(args.profile, config.OUTPUT_FORMATS.get(args.format, args.format.lower()))
+        except ValueError as e:
+            parser.error(str(e))
+
+    defaults = {key: value for key, value in
+                (("voice", args.voice), ("model", args.model), ("format", args.format)) if value}
+
+    budget = MemoryBudget(args.memory_budget * 1024 * 1024 or None, on_wait=print)
+    engine = AudioEngine(config.API_KEY, delivery_profile=args.profile,
+                         caption_formats=args.captions, memory_budget=budget)
+    engine.prewarm()
+    watcher = FolderWatcher(
+        engine,
+        Path(args.input_dir),
+        max_workers=args.workers,
+        settle_seconds=args.settle,
+        poll_interval=args.poll_interval,
+        use_events=not args.polling,
+        defaults=defaults,
+        progress_callback=print
+    )
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        print(f"Stopped: {watcher.stats['done']} done, {watcher.stats['failed']} failed")
+        print(f"Memory: {budget.summary()}")
+        print(f"Latency: {engine.latency_summary()}")
+
+
+if __name__ == "__main__":
+    main()
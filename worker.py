@@ -0,0 +1,342 @@
+"""
+Render workers pulling jobs from a shared durable queue
+
+Usage:
+    python worker.py enqueue /mnt/shared/queue.db scripts/*.txt
+    python worker.py run /mnt/shared/queue.db --output-root /mnt/shared/renders --processes 4
+    python worker.py status /mnt/shared/queue.db
+    python worker.py bench --workers 1 2 4 8
+    python worker.py bench --workers 2 --jobs 8 --latency 2 --lease 0.5 --heartbeat 0.15
+
+Run "worker.py run" on as many machines as needed, all pointing at the
+same queue and output root.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+import config
+from analysis import check_output
+from audio_engine import AudioEngine
+from captions import CAPTION_FORMATS, caption_path, copy_captions, parse_formats
+from encoders import encode_pcm
+from job_queue import JobQueue, open_queue
+from jobs import load_job_file, render_job
+from utils import sanitize_filename
+
+
+class Worker:
+    """Leases jobs from a queue and renders them into a shared output root"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        engine: Optional[AudioEngine],
+        output_root: Path,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 120.0,
+        heartbeat_interval: float = 30.0,
+        render: Callable = render_job,
+        check_outputs: bool = True,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the worker
+
+        Args:
+            queue: Shared job queue
+            engine: Audio engine used to render jobs
+            output_root: Shared output directory
+            worker_id: Unique worker name (default: host, pid and a random suffix)
+            lease_seconds: How long a job stays leased without a heartbeat
+            heartbeat_interval: Seconds between lease extensions while rendering
+            render: Render function with the signature of jobs.render_job
+            check_outputs: Analyze each output and record it in the QA index
+            progress_callback: Callback function for progress updates
+        """
+        self.queue = queue
+        self.engine = engine
+        self.output_root = Path(output_root)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.render = render
+        self.check_outputs = check_outputs
+        self.progress_callback = progress_callback
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        self._stop = threading.Event()
+        self.stats = {"done": 0, "failed": 0}
+
+    def run(self, stop_when_empty: bool = False, poll_interval: float = 1.0):
+        """
+        Process jobs until stop() is called
+
+        Args:
+            stop_when_empty: Return as soon as the queue has nothing to lease
+            poll_interval: Seconds to wait when the queue is empty
+        """
+        while not self._stop.is_set():
+            leased = self.queue.lease(self.worker_id, self.lease_seconds)
+            if leased is None:
+                if stop_when_empty:
+                    return
+                self._stop.wait(poll_interval)
+                continue
+            self.process(leased)
+
+    def stop(self):
+        """Stop after the current job"""
+        self._stop.set()
+
+    def process(self, leased: dict):
+        """Render one leased job, keeping its lease alive meanwhile"""
+        job_id = leased["id"]
+        job = leased["job"]
+        name = leased["output_name"] or f"{sanitize_filename(job['text'][:100])}_{job_id}"
+        output_path = self.output_root / f"{name}.{job['format']}"
+        # Render under a hidden name, so readers of the shared root never see partial
+        # files; per worker, since a worker that lost its lease may still be rendering
+        partial_path = self.output_root / f".{name}.partial.{self.worker_id}.{job['format']}"
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+        heartbeat.start()
+
+        try:
+            self.render(self.engine, job, partial_path)
+            # Publish only while the lease is ours; otherwise the job belongs
+            # to another worker, whose output must not be replaced
+            if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                self._remove_partial(partial_path)
+                self._report(f"Job {job_id}: lease was lost, discarding this render")
+                return
+            os.replace(partial_path, output_path)
+            copy_captions(partial_path, output_path, move=True)
+        except Exception as e:
+            self._remove_partial(partial_path)
+            self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+            self.stats["failed"] += 1
+            self._report(f"Job {job_id} failed (attempt {leased['attempts']}): {str(e)}")
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if self.queue.complete(job_id, self.worker_id, str(output_path)):
+            self.stats["done"] += 1
+            qa_flags = check_output(output_path, job.get("transcript") or job["text"]) if self.check_outputs else []
+            qa_note = f" (QA warnings: {', '.join(qa_flags)})" if qa_flags else ""
+            self._report(f"Job {job_id} done: {output_path.name}{qa_note}")
+        else:
+            self._report(f"Job {job_id}: lease was lost, another worker is rendering it")
+
+    def _remove_partial(self, partial_path: Path):
+        """Delete a partial render and its captions"""
+        partial_path.unlink(missing_ok=True)
+        for fmt in CAPTION_FORMATS:
+            caption_path(partial_path, fmt).unlink(missing_ok=True)
+
+    def _heartbeat(self, job_id: int, done: threading.Event):
+        """Extend the lease until the job finishes"""
+        while not done.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                self._report(f"Job {job_id}: lease lost")
+                return
+
+    def _report(self, message: str):
+        if self.progress_callback:
+            self.progress_callback(f"[{self.worker_id}] {message}")
+
+
+def _run_worker_process(queue_url: str, output_root: str, lease_seconds: float,
+                        heartbeat_interval: float, stop_when_empty: bool, delivery_profile: str,
+                        caption_formats: tuple[str, ...]):
+    """Entry point of one worker process"""
+    engine = AudioEngine(config.API_KEY, delivery_profile=delivery_profile,
+                         caption_formats=caption_formats)
+    engine.prewarm()
+    queue = open_queue(queue_url)
+    worker = Worker(queue, engine, Path(output_root), lease_seconds=lease_seconds,
+                    heartbeat_interval=heartbeat_interval, progress_callback=print)
+    try:
+        worker.run(stop_when_empty=stop_when_empty)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+        print(f"[{worker.worker_id}] Latency: {engine.latency_summary()}")
+
+
+def _simulated_render(engine, job: dict, output_path: Path, progress_callback=None) -> Path:
+    """Stand-in for render_job in benchmarks: fixed API latency, then a real encode"""
+    time.sleep(job["latency"])
+    encode_pcm(bytes(int(job["seconds"] * config.AUDIO_SAMPLE_RATE) * 2), output_path)
+    # One line per render, so bench() can tell whether any job ran twice
+    with open(job["render_log"], "a", encoding="utf-8") as f:
+        f.write(f"{job['text']}\n")
+    return output_path
+
+
+def _run_bench_process(queue_url: str, output_root: str, lease_seconds: float, heartbeat_interval: float):
+    """Entry point of one benchmark worker process"""
+    queue = open_queue(queue_url)
+    worker = Worker(
+        queue, None, Path(output_root), render=_simulated_render,
+        lease_seconds=lease_seconds, heartbeat_interval=heartbeat_interval, check_outputs=False
+    )
+    worker.run(stop_when_empty=True)
+    queue.close()
+
+
+def run_processes(target: Callable, args: tuple, count: int):
+    """Start worker processes and wait for them"""
+    processes = [multiprocessing.Process(target=target, args=args) for _ in range(count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+def bench(
+    worker_counts: list[int],
+    jobs: int,
+    latency: float,
+    lease_seconds: float = 120.0,
+    heartbeat_interval: float = 30.0
+) -> list[tuple[int, float]]:
+    """
+    Measure queue throughput with simulated renders for several worker counts
+
+    Each job waits for a fixed latency (standing in for the API call) and then
+    encodes a short WAV into a temporary output root, so the numbers show how
+    the queue, leasing and output writes scale across processes.
+
+    With a lease shorter than the latency, only the heartbeat keeps a job
+    from being leased again, so the run also checks that no job is
+    rendered twice.
+
+    Args:
+        worker_counts: Worker process counts to measure
+        jobs: Jobs per run
+        latency: Simulated API latency per job in seconds
+        lease_seconds: Lease length in seconds
+        heartbeat_interval: Seconds between heartbeats
+
+    Returns:
+        List of (worker count, jobs per second)
+    """
+    results = []
+    for count in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue_url = str(Path(tmp) / "queue.db")
+            render_log = Path(tmp) / "renders.log"
+            render_log.touch()
+            queue = open_queue(queue_url)
+            queue.enqueue_many([
+                {"text": f"Benchmark job {i}", "format": "wav", "latency": latency, "seconds": 2.0,
+                 "render_log": str(render_log)}
+                for i in range(jobs)
+            ])
+
+            start = time.perf_counter()
+            run_processes(
+                _run_bench_process,
+                (queue_url, str(Path(tmp) / "out"), lease_seconds, heartbeat_interval),
+                count
+            )
+            elapsed = time.perf_counter() - start
+
+            counts = queue.counts()
+            queue.close()
+            if counts["done"] != jobs:
+                raise RuntimeError(f"Benchmark lost jobs: {counts}")
+            renders = len(render_log.read_text(encoding="utf-8").splitlines())
+            if renders != jobs:
+                raise RuntimeError(f"Benchmark rendered {renders} times for {jobs} jobs")
+            results.append((count, jobs / elapsed))
+    return results
+
+
+def main():
+    """Worker command line"""
+    parser = argparse.ArgumentParser(description="Distributed render workers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add script files to a queue")
+    enqueue_parser.add_argument("queue", help="Queue file or URL (e.g. sqlite:///mnt/shared/queue.db)")
+    enqueue_parser.add_argument("scripts", nargs="+", help=".txt or .json script files")
+    enqueue_parser.add_argument("--profile", choices=sorted(config.DELIVERY_PROFILES),
+                                help="Delivery profile the workers run with, to check each job's format against")
+
+    run_parser = subparsers.add_parser("run", help="Render jobs from a queue")
+    run_parser.add_argument("queue", help="Queue file or URL")
+    run_parser.add_argument("--output-root", default=str(config.DEFAULT_OUTPUT_DIR),
+                            help="Shared output directory (default: outputs/)")
+    run_parser.add_argument("--processes", type=int, default=1, help="Worker processes on this machine")
+    run_parser.add_argument("--lease", type=float, default=120.0, help="Lease length in seconds")
+    run_parser.add_argument("--heartbeat", type=float, default=30.0, help="Seconds between heartbeats")
+    run_parser.add_argument("--exit-when-empty", action="store_true",
+                            help="Exit once the queue has nothing left to lease")
+    run_parser.add_argument("--profile", default="native", choices=sorted(config.DELIVERY_PROFILES),
+                            help="Delivery profile (default: native)")
+    run_parser.add_argument("--captions", type=parse_formats, default=config.CAPTIONS,
+                            help="Caption files per render, e.g. srt,vtt,json or none")
+
+    status_parser = subparsers.add_parser("status", help="Show job counts")
+    status_parser.add_argument("queue", help="Queue file or URL")
+
+    bench_parser = subparsers.add_parser("bench", help="Measure throughput vs. worker count")
+    bench_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    bench_parser.add_argument("--jobs", type=int, default=80)
+    bench_parser.add_argument("--latency", type=float, default=0.25,
+                              help="Simulated API latency per job in seconds")
+    bench_parser.add_argument("--lease", type=float, default=120.0,
+                              help="Lease length in seconds (below --latency to check heartbeats)")
+    bench_parser.add_argument("--heartbeat", type=float, default=30.0, help="Seconds between heartbeats")
+
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        queue = open_queue(args.queue)
+        for script in args.scripts:
+            try:
+                job = load_job_file(Path(script), delivery_profile=args.profile)
+                job_id = queue.enqueue(job, output_name=Path(script).stem)
+                print(f"Queued {script} as job {job_id}")
+            except Exception as e:
+                print(f"Error: {script}: {str(e)}")
+        queue.close()
+
+    elif args.command == "run":
+        run_processes(
+            _run_worker_process,
+            (args.queue, args.output_root, args.lease, args.heartbeat, args.exit_when_empty,
+             args.profile, args.captions),
+            args.processes
+        )
+
+    elif args.command == "status":
+        queue = open_queue(args.queue)
+        print(", ".join(f"{state}: {count}" for state, count in queue.counts().items()))
+        queue.close()
+
+    elif args.command == "bench":
+        baseline = None
+        for count, throughput in bench(args.workers, args.jobs, args.latency, args.lease, args.heartbeat):
+            baseline = baseline or throughput
+            print(f"{count:>3} workers: {throughput:6.1f} jobs/s ({throughput / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()